@@ -1,17 +1,21 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Request
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Request, HTTPException
 from starlette.requests import Request as starletteRequest
 from configuration import BUCKET_NAME
 import asyncio
 import json
-import boto3
 import hashlib
+import threading
+import time
+from pydantic import BaseModel
+from botocore.exceptions import ClientError
 from services.chat_service import QueryRequest, query_pipeline, IngestRequest, ingest_files_endpoint
+from services.registry import get_s3_client, get_ingest_queue
 from collections import defaultdict
 
 router = APIRouter()
 
 
-s3_client = boto3.client("s3", region_name="ap-south-1")
+S3_REGION = "ap-south-1"
 
 
 def sha256_hash(value: str):
@@ -60,6 +64,29 @@ class ConnectionManager:
 manager = ConnectionManager()
 
 
+def start_ingest_event_relay():
+    """
+    Forwards ingestion job status changes (published by the workers on Redis)
+    to the WebSocket room of the job's thread as {"type": "ingest", ...} messages.
+    Call from the event loop (app lifespan).
+    """
+    loop = asyncio.get_running_loop()
+
+    def relay():
+        while True:
+            try:
+                for event in get_ingest_queue().listen_events():
+                    if not event.get("thread_id"):
+                        continue
+                    message = {**event, "type": "ingest", "thread_id": event["thread_id"].split(":", 1)[-1]}
+                    asyncio.run_coroutine_threadsafe(manager.send_to_room(event["thread_id"], message), loop)
+            except Exception as e:
+                print(f"[IngestRelay] Subscription lost ({e}); reconnecting in 5s")
+                time.sleep(5)
+
+    threading.Thread(target=relay, name="ingest-event-relay", daemon=True).start()
+
+
 @router.websocket("/ws")
 async def ws_endpoint(ws: WebSocket):
     await manager.connect(ws)
@@ -146,7 +173,7 @@ async def ws_endpoint(ws: WebSocket):
 
 @router.get("/get-presigned-url")
 def get_presigned_url(filename: str):
-    url = s3_client.generate_presigned_url(
+    url = get_s3_client(S3_REGION).generate_presigned_url(
         "get_object",
         Params={"Bucket": BUCKET_NAME, "Key": filename},
         ExpiresIn=3600,  # URL valid for 1 hour
@@ -174,20 +201,52 @@ def get_presigned_url(
     # Final S3 Key →   <hash>/<filename>
     s3_key = f"{hash_path}/{filename}"
 
-    thread_id = f"{hash_path}:{conversation_id}"
     file_path = s3_key
     
   
-    url = s3_client.generate_presigned_url(
+    url = get_s3_client(S3_REGION).generate_presigned_url(
         ClientMethod="put_object",
         Params={"Bucket": BUCKET_NAME, "Key": s3_key, "ContentType": filetype},
         ExpiresIn=3600,  # URL valid for 1 hour
     )
     
-    ingestReq = IngestRequest(thread_id=thread_id, file_name=file_path)
-    print(f"ingest {ingestReq}")
-    response = ingest_files_endpoint(ingestReq)
-    
-    print(response)
-    
+    # Ingestion is queued by /upload-complete once the client's PUT has finished
     return {"uploadURL": url, "file_path": file_path}
+
+
+class UploadCompleteRequest(BaseModel):
+    file_path: str
+    conversation_id: str
+
+
+@router.post("/upload-complete")
+def upload_complete(body: UploadCompleteRequest, request: Request):
+    userData = request.session.get("user")
+    hash_path = sha256_hash(f"{userData["email"]}:{userData["sub"]}")
+    if not body.file_path.startswith(f"{hash_path}/"):
+        raise HTTPException(status_code=403, detail="File does not belong to this user")
+
+    # The object must exist; its ETag versions the job so a re-upload is ingested again
+    try:
+        head = get_s3_client(S3_REGION).head_object(Bucket=BUCKET_NAME, Key=body.file_path)
+    except ClientError:
+        raise HTTPException(status_code=409, detail="Upload not found; PUT the file first")
+
+    ingestReq = IngestRequest(thread_id=f"{hash_path}:{body.conversation_id}", file_name=body.file_path, version=head.get("ETag", "").strip('"'))
+    print(f"ingest {ingestReq}")
+    return ingest_files_endpoint(ingestReq)
+
+
+@router.get("/ingest-status")
+def ingest_status(request: Request, conversation_id: str = "", job_id: str = ""):
+    """One job's status, or every ingestion job of a conversation."""
+    userData = request.session.get("user")
+    hash_path = sha256_hash(f"{userData["email"]}:{userData["sub"]}")
+    queue = get_ingest_queue()
+
+    if job_id:
+        job = queue.get(job_id)
+        if not job or not job.get("thread_id", "").startswith(f"{hash_path}:"):
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+    return {"jobs": queue.thread_jobs(f"{hash_path}:{conversation_id}")}
@@ -16,13 +16,21 @@ import uuid
 router = APIRouter()
 
 ACCESS_TOKEN_EXPIRE_MINUTES = 3600
-users_db = {
-    "demo@example.com": {
-        "email": "demo@example.com",
-        "hashed_password": bcrypt.hashpw(b"demo123", bcrypt.gensalt()),
-        "full_name": "Demo User",
-    }
-}
+_users_db = None
+
+
+def get_users_db():
+    # bcrypt is deliberately slow (~0.25 s per hash): build the demo user on first login, not at import
+    global _users_db
+    if _users_db is None:
+        _users_db = {
+            "demo@example.com": {
+                "email": "demo@example.com",
+                "hashed_password": bcrypt.hashpw(b"demo123", bcrypt.gensalt()),
+                "full_name": "Demo User",
+            }
+        }
+    return _users_db
 
 
 def verify_password(plain, hashed):
@@ -72,7 +80,7 @@ class LoginRequest(BaseModel):
     
 @router.post("/login")
 def login(req: LoginRequest):
-    user = users_db.get(req.username)
+    user = get_users_db().get(req.username)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid username or password")
 
@@ -10,6 +10,69 @@ ALGORITHM =  os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = 3600
 BUCKET_NAME = os.getenv("BUCKET_NAME")
 
+# Build models/clients/graph in the lifespan startup phase (false = lazily on first request)
+WARM_ON_STARTUP = os.getenv("WARM_ON_STARTUP", "true").lower() == "true"
+
+# Embedding runtime: "torch", "onnx" or "onnx-int8" (ONNX Runtime, dynamic int8 quantization)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0")) or None
+EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION", "avx2")
+
+# Micro-batching of concurrent query embeddings (0 = disabled, encode per call)
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "64"))
+
+# Public case search backend: "s3" (S3 Vectors) or "local" (memory-mapped IVF index)
+CASE_INDEX_BACKEND = os.getenv("CASE_INDEX_BACKEND", "s3")
+CASE_INDEX_DIR = os.getenv("CASE_INDEX_DIR")
+# S3 case-result cache: cosine needed to reuse a cached query's results (the section set must match too)
+CASE_CACHE_SIMILARITY = float(os.getenv("CASE_CACHE_SIMILARITY", "0.97"))
+
+# Spill directory for per-thread private document indexes (shared by all workers on a node)
+THREAD_INDEX_DIR = os.getenv("THREAD_INDEX_DIR")
+# Stored precision of those indexes: "float32", "float16" or "int8"
+THREAD_INDEX_DTYPE = os.getenv("THREAD_INDEX_DTYPE", "float32")
+
+# Optional cross-encoder reranking between retrieval and prompt assembly (local model only)
+RERANKER_ENABLED = os.getenv("RERANKER_ENABLED", "false").lower() == "true"
+RERANKER_MODEL = os.getenv("RERANKER_MODEL")
+RERANKER_TOP_N = int(os.getenv("RERANKER_TOP_N", "6"))
+RERANKER_BATCH_SIZE = int(os.getenv("RERANKER_BATCH_SIZE", "16"))
+
+# Ingestion job queue (Redis); jobs are run by `python -m services.ingest_queue` workers
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))
+# Streaming ingestion: chunks embedded per batch, and embedded batches allowed in flight to S3
+INGEST_EMBED_BATCH = int(os.getenv("INGEST_EMBED_BATCH", "64"))
+INGEST_UPLOAD_WINDOW = int(os.getenv("INGEST_UPLOAD_WINDOW", "2"))
+# Jobs one ingestion worker process runs at once (0 = one per PDF pool process, so every core gets a file)
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "0"))
+# Attach a user's re-uploaded (byte-identical) PDF to the new thread instead of re-ingesting it
+INGEST_DEDUP = os.getenv("INGEST_DEDUP", "true").lower() == "true"
+# PDF page extraction process pool (0 = one process per core, -1 = parse in the ingesting thread)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+# Documents with fewer pages are parsed inline by their job instead of on the pool. 0 sends every
+# document to the pool (a short one is a single task), so concurrent small uploads use separate cores
+PDF_MIN_PAGES_FOR_POOL = int(os.getenv("PDF_MIN_PAGES_FOR_POOL", "0"))
+# Uploads below this size are buffered in memory; larger ones spill to a private temp file.
+# Page extraction still goes to the PDF process pool by page count, wherever the bytes live.
+DOWNLOAD_SPOOL_MAX_MB = int(os.getenv("DOWNLOAD_SPOOL_MAX_MB", "32"))
+# Redis-backed chunk-text -> embedding cache for re-ingesting revised documents (0 = off)
+CHUNK_CACHE_MAX_MB = int(os.getenv("CHUNK_CACHE_MAX_MB", "256"))
+# put_vectors batching: per-request vector/byte caps and concurrent requests
+UPLOAD_MAX_VECTORS = int(os.getenv("UPLOAD_MAX_VECTORS", "500"))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(16 * 1024 * 1024)))
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
+
+# Generation max_tokens; reserved out of the model context window for the answer
+ANSWER_MAX_TOKENS = 4096
+
+# Token budget for retrieved context in the RAG prompt (answer tokens are reserved on top)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+MODEL_CONTEXT_WINDOW = int(os.getenv("MODEL_CONTEXT_WINDOW", "131072"))
+# Local tiktoken encoding files (filled at build time: python -m services.context_packer fetch)
+TIKTOKEN_CACHE_DIR = os.getenv("TIKTOKEN_CACHE_DIR")
+
 # Simple manual .env loader
 def load_env(path=".env"):
     with open(path) as f:
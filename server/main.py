@@ -5,24 +5,17 @@ from configuration import SECRET_KEY, ALGORITHM, BUCKET_NAME
 from fastapi.responses import HTMLResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
-import boto3
 from fastapi.middleware.cors import CORSMiddleware
-import bcrypt
 from starlette.middleware import Middleware
 from starlette.middleware.sessions import SessionMiddleware
 from middleware.AuthGaurdMiddleware import AuthGuardMiddleware
 from middleware.WebSocketAuthMiddleware import WebSocketAuthMiddleware
 from api.user import router as user_router
-from api.message import router as chat_router
+from api.message import router as chat_router, start_ingest_event_relay
+from services import registry
+from contextlib import asynccontextmanager
 
 ACCESS_TOKEN_EXPIRE_MINUTES = 3600
-users_db = {
-    "demo@example.com": {
-        "email": "demo@example.com",
-        "hashed_password": bcrypt.hashpw(b"demo123", bcrypt.gensalt()),
-        "full_name": "Demo User",
-    }
-}
 
 middleware = [
     Middleware(SessionMiddleware, 
@@ -34,7 +27,15 @@ middleware = [
     Middleware(WebSocketAuthMiddleware),
 ]
 
-app = FastAPI(middleware=middleware)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load shared models/clients once per worker before serving traffic
+    registry.startup()
+    start_ingest_event_relay()
+    yield
+    registry.shutdown()
+
+app = FastAPI(middleware=middleware, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
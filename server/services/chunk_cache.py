@@ -0,0 +1,73 @@
+import hashlib
+import threading
+import time
+from typing import Dict, List, Optional
+import numpy as np
+
+class ChunkEmbeddingCache:
+    """
+    Persistent chunk-text -> embedding cache in Redis, shared by every worker.
+
+      embcache:<model>:<sha256(text)>  raw float32 bytes of the vector
+      embcache:<model>:lru             zset of text hashes scored by last use
+
+    Entries are fixed-size, so the byte budget is enforced as an entry cap:
+    when the zset grows past it, the least recently used vectors are dropped.
+    Needs a Redis client created with decode_responses=False.
+    """
+
+    def __init__(self, redis_client, model_key: str, max_bytes: int = 256 * 1024 * 1024, dim: int = 384):
+        self.redis = redis_client
+        self.prefix = f"embcache:{model_key}"
+        self.lru_key = f"{self.prefix}:lru"
+        # ~100 bytes of key + zset overhead per entry on top of the vector itself
+        self.max_entries = max(1, max_bytes // (dim * 4 + 100))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        if not texts:
+            return []
+        hashes = [self.text_hash(t) for t in texts]
+        raw = self.redis.mget([f"{self.prefix}:{h}" for h in hashes])
+        vectors = [np.frombuffer(r, dtype="float32") if r else None for r in raw]
+
+        found = {h: time.time() for h, v in zip(hashes, vectors) if v is not None}
+        if found:
+            self.redis.zadd(self.lru_key, found)
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(texts) - len(found)
+        return vectors
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        if not texts:
+            return
+        now = time.time()
+        pipe = self.redis.pipeline(transaction=False)
+        scores = {}
+        for text, vec in zip(texts, vectors):
+            h = self.text_hash(text)
+            pipe.set(f"{self.prefix}:{h}", np.asarray(vec, dtype="float32").tobytes())
+            scores[h] = now
+        pipe.zadd(self.lru_key, scores)
+        pipe.zcard(self.lru_key)
+        size = pipe.execute()[-1]
+        if size > self.max_entries:
+            self._evict(size - self.max_entries)
+
+    def _evict(self, count: int):
+        evicted = self.redis.zpopmin(self.lru_key, count)
+        if evicted:
+            self.redis.delete(*[f"{self.prefix}:{h.decode() if isinstance(h, bytes) else h}" for h, _ in evicted])
+            print(f"[ChunkCache] Evicted {len(evicted)} least recently used embeddings.")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0, "max_entries": self.max_entries}
@@ -0,0 +1,161 @@
+import argparse
+import hashlib
+import os
+from typing import Any, Dict, List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a conservative character estimate
+    tiktoken = None
+
+DEFAULT_TIKTOKEN_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "tiktoken")
+# Where tiktoken fetches each encoding; its cache file under TIKTOKEN_CACHE_DIR is sha1(url)
+TIKTOKEN_BLOBS = {
+    "o200k_base": "https://openaipublic.blob.core.windows.net/encodings/o200k_base.tiktoken",
+    "cl100k_base": "https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken",
+}
+
+def cached_encoding_path(cache_dir: str, encoding_name: str) -> Optional[str]:
+    blob = TIKTOKEN_BLOBS.get(encoding_name)
+    return os.path.join(cache_dir, hashlib.sha1(blob.encode()).hexdigest()) if blob else None
+
+
+def fetch_encoding(cache_dir: str = DEFAULT_TIKTOKEN_DIR, encoding_name: str = "o200k_base") -> str:
+    """Downloads an encoding into cache_dir (a build step; workers never download)."""
+    if tiktoken is None:
+        raise RuntimeError("tiktoken is not installed (pip install -r requirement.txt)")
+    os.makedirs(cache_dir, exist_ok=True)
+    os.environ["TIKTOKEN_CACHE_DIR"] = cache_dir
+    tiktoken.get_encoding(encoding_name)
+    path = cached_encoding_path(cache_dir, encoding_name)
+    if path is None or not os.path.exists(path):
+        raise RuntimeError(f"{encoding_name} was not cached in {cache_dir}")
+    print(f"[ContextPacker] Cached {encoding_name} at {path}")
+    return path
+
+
+class TokenCounter:
+    """
+    Counts tokens locally. Uses tiktoken's o200k_base (the gpt-oss tokenizer family)
+    from the encoding file in cache_dir, otherwise ~3.5 chars/token, which
+    over-counts slightly so the packed prompt never exceeds the real limit.
+    A missing file is reported instead of downloaded on the request path.
+    """
+
+    def __init__(self, encoding_name: str = "o200k_base", chars_per_token: float = 3.5, cache_dir: Optional[str] = None):
+        self.chars_per_token = chars_per_token
+        self.encoding = None
+        if tiktoken is None:
+            print("[ContextPacker] tiktoken not installed; using character estimate.")
+            return
+        cache_dir = cache_dir or DEFAULT_TIKTOKEN_DIR
+        path = cached_encoding_path(cache_dir, encoding_name)
+        if path is None or not os.path.exists(path):
+            print(f"[ContextPacker] {encoding_name} not found in {cache_dir} (run `python -m services.context_packer fetch`); using character estimate.")
+            return
+        # tiktoken reads this on load: it finds the local file and skips the download
+        os.environ["TIKTOKEN_CACHE_DIR"] = cache_dir
+        try:
+            self.encoding = tiktoken.get_encoding(encoding_name)
+        except Exception as e:
+            print(f"[ContextPacker] tiktoken encoding unavailable ({e}); using character estimate.")
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return int(len(text) / self.chars_per_token) + 1
+
+
+class ContextPacker:
+    """
+    Packs whole context blocks greedily by relevance into a token budget.
+
+    Budget = min(context_budget, model_context_window - answer_tokens - prompt_tokens).
+    Blocks are dicts {"section": header, "text": block, "score": relevance}. Chosen
+    blocks are emitted in their original order under their section headers.
+    """
+
+    def __init__(self, counter: Optional[TokenCounter] = None, context_budget: int = 6000, model_context_window: int = 131072, answer_tokens: int = 4096):
+        self.counter = counter or TokenCounter()
+        self.context_budget = context_budget
+        self.model_context_window = model_context_window
+        self.answer_tokens = answer_tokens
+
+    def budget_for(self, prompt_tokens: int) -> int:
+        return max(0, min(self.context_budget, self.model_context_window - self.answer_tokens - prompt_tokens))
+
+    def pack(self, blocks: List[Dict[str, Any]], prompt_tokens: int = 0) -> Dict[str, Any]:
+        budget = self.budget_for(prompt_tokens)
+        sep_tokens = self.counter.count("\n\n")
+        costs = [self.counter.count(b["text"]) + sep_tokens for b in blocks]
+        header_costs = {}
+
+        # Greedy by relevance; ties keep retrieval order
+        by_relevance = sorted(range(len(blocks)), key=lambda i: -float(blocks[i].get("score") or 0.0))
+        chosen, used = set(), 0
+        for i in by_relevance:
+            section = blocks[i].get("section")
+            # A section header is paid for once, with its first block
+            header = 0
+            if section and section not in header_costs:
+                header = self.counter.count(section) + sep_tokens
+            if used + costs[i] + header <= budget:
+                chosen.add(i)
+                used += costs[i] + header
+                if section and section not in header_costs:
+                    header_costs[section] = header
+
+        truncated = False
+        if not chosen and blocks and budget > 0:
+            # Even the best block is over budget: send its head rather than no evidence at all
+            top = by_relevance[0]
+            keep_chars = int(len(blocks[top]["text"]) * budget / max(1, costs[top] + sep_tokens))
+            blocks = list(blocks)
+            blocks[top] = {**blocks[top], "text": blocks[top]["text"][:keep_chars]}
+            chosen.add(top)
+            used, truncated = budget, True
+
+        parts, current_section = [], None
+        for i, block in enumerate(blocks):
+            if i not in chosen:
+                continue
+            if block.get("section") and block["section"] != current_section:
+                current_section = block["section"]
+                parts.append(current_section)
+            parts.append(block["text"])
+
+        dropped = [
+            {"section": blocks[i].get("section"), "tokens": costs[i], "score": blocks[i].get("score"), "preview": blocks[i]["text"][:80]}
+            for i in range(len(blocks)) if i not in chosen
+        ]
+        return {"context": "\n\n".join(parts), "used_tokens": used, "budget_tokens": budget, "kept": len(chosen), "truncated": truncated, "dropped": dropped}
+
+
+def relevance_scores(results: List[Dict[str, Any]]) -> List[float]:
+    """
+    Per-section relevance in [0, 1]: rerank/fusion scores min-max rescaled within the
+    section, so the top file fact and the top precedent compete on equal terms.
+    """
+    raw = [r.get("rerank_score", r.get("score")) for r in results]
+    if any(v is None for v in raw):
+        # No scores (e.g. plain dense hits): retrieval order is the ranking
+        return [1.0 / (rank + 1) for rank in range(len(results))]
+    low, high = min(raw), max(raw)
+    if high == low:
+        return [1.0] * len(raw)
+    return [(v - low) / (high - low) for v in raw]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Context packer tooling")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_fetch = sub.add_parser("fetch", help="Download the tiktoken encoding into TIKTOKEN_CACHE_DIR (run at build time)")
+    p_fetch.add_argument("--encoding", default="o200k_base", choices=sorted(TIKTOKEN_BLOBS))
+    p_fetch.add_argument("--cache-dir", default=None)
+
+    args = parser.parse_args()
+    if args.command == "fetch":
+        import configuration as config
+        fetch_encoding(args.cache_dir or config.TIKTOKEN_CACHE_DIR or DEFAULT_TIKTOKEN_DIR, args.encoding)
@@ -0,0 +1,135 @@
+import hashlib
+import re
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(_WORD.findall(text.lower()))
+
+
+def content_hash(text: str) -> str:
+    """Exact-duplicate key: whitespace/case/punctuation-insensitive."""
+    return hashlib.sha1(normalize_text(text).encode()).hexdigest()
+
+
+def simhash(text: str, bits: int = 64, shingle: int = 3) -> int:
+    """64-bit SimHash over word shingles; near-identical texts differ in few bits."""
+    words = _WORD.findall(text.lower())
+    shingles = [" ".join(words[i:i + shingle]) for i in range(max(1, len(words) - shingle + 1))]
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(sh.encode(), digest_size=bits // 8).digest(), "big") for sh in shingles],
+        dtype="uint64"
+    )
+    # (n_shingles, bits) 0/1 matrix -> per-bit majority vote
+    bit_matrix = (hashes[:, None] >> np.arange(bits, dtype="uint64")) & np.uint64(1)
+    votes = bit_matrix.sum(axis=0) * 2 > len(hashes)
+    return sum(1 << int(b) for b in np.flatnonzero(votes))
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def remove_near_duplicates(docs: List[Dict[str, Any]], text_fn: Callable[[Dict[str, Any]], str], max_hamming: int = 6) -> List[Dict[str, Any]]:
+    """
+    Drops exact (content hash) and near (SimHash) duplicates, keeping the first
+    occurrence, so callers should pass docs best-first.
+    """
+    kept, seen_hashes, fingerprints = [], set(), []
+    for doc in docs:
+        text = text_fn(doc)
+        if not text:
+            continue
+        digest = content_hash(text)
+        if digest in seen_hashes:
+            continue
+        fp = simhash(text)
+        if any(hamming(fp, other) <= max_hamming for other in fingerprints):
+            continue
+        seen_hashes.add(digest)
+        fingerprints.append(fp)
+        kept.append(doc)
+    return kept
+
+
+def _join_overlapping(prev: str, nxt: str, max_overlap: int = 200, min_overlap: int = 20) -> Optional[str]:
+    """Joins consecutive splitter chunks, removing the chunk_overlap text they share."""
+    for size in range(min(max_overlap, len(prev), len(nxt)), min_overlap - 1, -1):
+        if prev.endswith(nxt[:size]):
+            return prev + nxt[size:]
+    return None
+
+
+def _chunk_position(doc: Dict[str, Any]):
+    meta = doc.get("metadata", {})
+    return (int(meta.get("page", 0) or 0), int(meta.get("chunk_index", -1)))
+
+
+def merge_file_chunks(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Merges chunks of the same uploaded file into one block, ordered by
+    (page, chunk_index). Blocks keep the best chunk's score and rank position.
+    """
+    groups: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+    for doc in docs:
+        meta = doc.get("metadata", {})
+        groups.setdefault(meta.get("source") or meta.get("filename") or doc.get("key"), []).append(doc)
+
+    merged = []
+    for group in groups.values():
+        if len(group) == 1:
+            merged.append(group[0])
+            continue
+
+        ordered = sorted(group, key=_chunk_position)
+        text = ordered[0]["metadata"].get("text", "")
+        for prev, doc in zip(ordered, ordered[1:]):
+            nxt = doc["metadata"].get("text", "")
+            prev_idx, idx = _chunk_position(prev)[1], _chunk_position(doc)[1]
+            # Only neighbouring splitter chunks share chunk_overlap text
+            consecutive = prev_idx >= 0 and idx == prev_idx + 1
+            joined = _join_overlapping(text, nxt) if consecutive else None
+            text = joined if joined is not None else f"{text}\n[...]\n{nxt}"
+
+        best = group[0]
+        merged.append({
+            **best,
+            "metadata": {**best.get("metadata", {}), "text": text, "chunk_count": len(group)},
+            "score": max(d.get("score", 0.0) for d in group)
+        })
+    return merged
+
+
+def case_identity(metadata: Dict[str, Any]) -> str:
+    case_meta = metadata.get("case_metadata", [])
+    if isinstance(case_meta, list) and case_meta:
+        # [CaseName, Bench, Date, Filename]: the filename is the most specific id
+        return str(case_meta[3] if len(case_meta) > 3 else case_meta[0])
+    return metadata.get("case_about_detailed", "")[:50]
+
+
+def merge_case_records(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merges records of the same judgment into one block with each distinct issue/reasoning once."""
+    groups: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+    for doc in docs:
+        groups.setdefault(case_identity(doc.get("metadata", {})) or doc.get("key"), []).append(doc)
+
+    merged = []
+    for group in groups.values():
+        if len(group) == 1:
+            merged.append(group[0])
+            continue
+        best = group[0]
+        issues = list(dict.fromkeys(d["metadata"].get("main_issue") for d in group if d["metadata"].get("main_issue")))
+        reasons = list(dict.fromkeys(d["metadata"].get("decision_reasoning") for d in group if d["metadata"].get("decision_reasoning")))
+        metadata = {**best.get("metadata", {}), "record_count": len(group)}
+        if issues:
+            metadata["main_issue"] = " | ".join(issues)
+        if reasons:
+            metadata["decision_reasoning"] = "\n\n".join(reasons)
+        merged.append({**best, "metadata": metadata, "score": max(d.get("score", 0.0) for d in group)})
+    return merged
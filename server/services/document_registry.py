@@ -0,0 +1,206 @@
+import hashlib
+import io
+import json
+import time
+from typing import Any, BinaryIO, Dict, List, Optional, Set, Union
+import numpy as np
+from services.vector_uploader import VectorUploader
+
+GET_BATCH = 100     # GetVectors keys per request
+DELETE_BATCH = 500  # DeleteVectors keys per request
+
+def file_sha256(path: Union[str, BinaryIO], block_size: int = 1024 * 1024) -> str:
+    """Hashes a file path or a binary stream (rewound afterwards so it can still be parsed)."""
+    digest = hashlib.sha256()
+    if not isinstance(path, str):
+        if isinstance(path, io.BytesIO):
+            digest.update(path.getbuffer())
+        else:
+            path.seek(0)
+            for block in iter(lambda: path.read(block_size), b""):
+                digest.update(block)
+        path.seek(0)
+        return digest.hexdigest()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DocumentRegistry:
+    """
+    Content-addressed registry of ingested PDFs, so a document uploaded into
+    several conversations is parsed and embedded once.
+
+      docs:<owner>:<sha256>          hash: keys (json), filename, source, preview, chunks, created_at
+      docs:<owner>:<sha256>:threads  set of thread ids referencing the vectors (the refcount)
+      docs:thread:<thread_id>        set of "<owner>:<sha256>" the thread references
+
+    The owner is the user part of the thread id, so documents are never shared
+    across users. Attaching a thread adds it to the `user` metadata list of the
+    existing vectors (the private-file filter is `user $in [thread_id]`);
+    releasing removes it, and the vectors are deleted with the last reference.
+
+    Vector keys are derived from (owner, sha256, chunk index), so two threads
+    ingesting the same bytes at once write the same vectors; whichever registers
+    second repairs the `user` lists its uploads may have overwritten.
+    """
+
+    def __init__(self, redis_client, vector_store, uploader: VectorUploader):
+        self.redis = redis_client
+        self.vector_store = vector_store
+        self.uploader = uploader
+
+    @staticmethod
+    def owner(thread_id: str) -> str:
+        return thread_id.split(":", 1)[0]
+
+    def _key(self, thread_id: str, digest: str) -> str:
+        return f"docs:{self.owner(thread_id)}:{digest}"
+
+    def lookup(self, thread_id: str, digest: str) -> Optional[Dict[str, Any]]:
+        doc = self.redis.hgetall(self._key(thread_id, digest))
+        if not doc:
+            return None
+        doc["keys"] = json.loads(doc["keys"])
+        return doc
+
+    def threads(self, thread_id: str, digest: str) -> Set[str]:
+        """Threads already referencing the document (the `user` list its vectors must keep)."""
+        return set(self.redis.smembers(f"{self._key(thread_id, digest)}:threads"))
+
+    def register(self, thread_id: str, digest: str, keys: List[str], filename: str, source: str, preview: str):
+        key = self._key(thread_id, digest)
+        # Atomic claim: of two first-time ingests of the same bytes, exactly one creates the entry
+        created = self.redis.hsetnx(key, "keys", json.dumps(keys))
+        if created:
+            self.redis.hset(key, mapping={
+                "filename": filename, "source": source,
+                "preview": preview or "", "chunks": len(keys), "created_at": time.time()
+            })
+        self.redis.sadd(f"{key}:threads", thread_id)
+        self.redis.sadd(f"docs:thread:{thread_id}", f"{self.owner(thread_id)}:{digest}")
+        if not created:
+            stale = json.loads(self.redis.hget(key, "keys") or "[]")
+            if stale != keys:
+                # A stale entry (vectors went missing) with keys from before re-ingestion: ours replace it
+                self.redis.hset(key, mapping={"keys": json.dumps(keys), "chunks": len(keys)})
+                self._delete_vectors(sorted(set(stale) - set(keys)))
+            # Our uploads may have replaced other threads' `user` lists
+            self._merge_users(keys, self.threads(thread_id, digest))
+            print(f"[DocumentRegistry] {filename} was already registered as {digest[:12]}; joined it.")
+            return
+        print(f"[DocumentRegistry] Registered {filename} ({len(keys)} vectors) as {digest[:12]}")
+
+    def _merge_users(self, keys: List[str], threads: Set[str]):
+        updated = []
+        for vec in self._get_vectors(keys):
+            metadata = dict(vec.get("metadata", {}))
+            users = self._users(metadata)
+            missing = sorted(threads - set(users))
+            if missing:
+                metadata["user"] = users + missing
+                updated.append({"key": vec["key"], "data": vec["data"], "metadata": metadata})
+        self.uploader.upload(updated)
+
+    def _get_vectors(self, keys: List[str]) -> List[Dict[str, Any]]:
+        vectors = []
+        for start in range(0, len(keys), GET_BATCH):
+            response = self.vector_store.s3vectors.get_vectors(
+                vectorBucketName=self.vector_store.bucket_name,
+                indexName=self.uploader.index_name,
+                keys=keys[start:start + GET_BATCH],
+                returnData=True,
+                returnMetadata=True
+            )
+            vectors.extend(response.get("vectors", []))
+        return vectors
+
+    def _delete_vectors(self, keys: List[str]):
+        for start in range(0, len(keys), DELETE_BATCH):
+            self.vector_store.s3vectors.delete_vectors(
+                vectorBucketName=self.vector_store.bucket_name,
+                indexName=self.uploader.index_name,
+                keys=keys[start:start + DELETE_BATCH]
+            )
+
+    @staticmethod
+    def _users(metadata: Dict[str, Any]) -> List[str]:
+        users = metadata.get("user") or []
+        return [users] if isinstance(users, str) else list(users)
+
+    def attach(self, thread_id: str, digest: str, fresh_thread: bool = True, filename: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        References an already-ingested document from thread_id: no parse, no embedding.
+        Returns the registry entry, or None when the vectors are gone (caller re-ingests).
+        """
+        doc = self.lookup(thread_id, digest)
+        if doc is None:
+            return None
+        start = time.perf_counter()
+        vectors = self._get_vectors(doc["keys"])
+        if len(vectors) < len(doc["keys"]):
+            print(f"[DocumentRegistry] {digest[:12]} has {len(vectors)}/{len(doc['keys'])} vectors left; re-ingesting.")
+            return None
+
+        updated = []
+        for vec in vectors:
+            metadata = dict(vec.get("metadata", {}))
+            users = self._users(metadata)
+            if thread_id not in users:
+                metadata["user"] = users + [thread_id]
+                updated.append({"key": vec["key"], "data": vec["data"], "metadata": metadata})
+        self.uploader.upload(updated)
+
+        try:
+            self.vector_store.thread_index.add(
+                thread_id,
+                np.asarray([vec["data"]["float32"] for vec in vectors], dtype="float32"),
+                [{"key": vec["key"], "metadata": vec.get("metadata", {})} for vec in vectors],
+                fresh_thread=fresh_thread,
+                filename=filename or doc["filename"]
+            )
+        except Exception as e:
+            print(f"!!! Thread index update failed (remote search still works): {e}")
+
+        key = self._key(thread_id, digest)
+        self.redis.sadd(f"{key}:threads", thread_id)
+        self.redis.sadd(f"docs:thread:{thread_id}", f"{self.owner(thread_id)}:{digest}")
+        print(f"[DocumentRegistry] Attached {doc['filename']} ({len(vectors)} vectors) to {thread_id} in {1000 * (time.perf_counter() - start):.0f} ms")
+        return doc
+
+    def release(self, thread_id: str, digest: str):
+        """Drops thread_id's reference; the last reference deletes the vectors and the entry."""
+        key = self._key(thread_id, digest)
+        self.redis.srem(f"docs:thread:{thread_id}", f"{self.owner(thread_id)}:{digest}")
+        if not self.redis.srem(f"{key}:threads", thread_id):
+            return
+        doc = self.lookup(thread_id, digest)
+        if doc is None:
+            return
+        try:
+            self.vector_store.thread_index.remove(thread_id, doc["keys"])
+        except Exception as e:
+            print(f"!!! Thread index update failed: {e}")
+
+        if self.redis.scard(f"{key}:threads") == 0:
+            self._delete_vectors(doc["keys"])
+            self.redis.delete(key, f"{key}:threads")
+            print(f"[DocumentRegistry] Deleted {doc['filename']} ({len(doc['keys'])} vectors): last reference released.")
+            return
+
+        # Still referenced elsewhere: just take this thread out of the filter list
+        updated = []
+        for vec in self._get_vectors(doc["keys"]):
+            metadata = dict(vec.get("metadata", {}))
+            users = self._users(metadata)
+            if thread_id in users:
+                metadata["user"] = [u for u in users if u != thread_id]
+                updated.append({"key": vec["key"], "data": vec["data"], "metadata": metadata})
+        self.uploader.upload(updated)
+        print(f"[DocumentRegistry] Released {doc['filename']} from {thread_id}.")
+
+    def release_thread(self, thread_id: str):
+        """Releases every document a thread references (e.g. when a conversation is deleted)."""
+        for member in self.redis.smembers(f"docs:thread:{thread_id}"):
+            self.release(thread_id, member.split(":", 1)[1])
@@ -1,28 +1,126 @@
+import fcntl
+import os
+import shutil
+import tempfile
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from typing import List
+from typing import List, Optional
+from services.embedding_cache import QueryEmbeddingCache
+
+DEFAULT_ONNX_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "onnx")
+BACKENDS = ("torch", "onnx", "onnx-int8")
 
 class EmbeddingManager:
     """Handles document embedding generation using SentenceTransformer."""
 
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(
+        self,
+        model_name: str = "all-MiniLM-L6-v2",
+        cache: Optional[QueryEmbeddingCache] = None,
+        backend: str = "torch",
+        intra_op_threads: Optional[int] = None,
+        onnx_dir: str = DEFAULT_ONNX_DIR,
+        quantization_config: str = "avx2"
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown embedding backend '{backend}'. Expected one of {BACKENDS}.")
         self.model_name = model_name
         self.model = None
+        # Optional query cache; repeated router queries skip the forward pass entirely
+        self.cache = cache
+        # "torch" (PyTorch), "onnx" (ONNX Runtime fp32) or "onnx-int8" (dynamic int8 quantized)
+        self.backend = backend
+        # ONNX: session intra-op threads; torch: torch.set_num_threads (process-wide)
+        self.intra_op_threads = intra_op_threads
+        self.onnx_dir = onnx_dir
+        # "avx2", "avx512", "avx512_vnni" or "arm64"; pick the best the CPU supports
+        self.quantization_config = quantization_config
         self._load_model()
 
+    def _onnx_model_kwargs(self) -> dict:
+        import onnxruntime as ort
+
+        session_options = ort.SessionOptions()
+        if self.intra_op_threads:
+            session_options.intra_op_num_threads = self.intra_op_threads
+        return {"provider": "CPUExecutionProvider", "session_options": session_options}
+
+    def _quantized_model_dir(self) -> str:
+        """
+        Exports + quantizes the model once, then reuses the files on disk.
+        API and ingest workers all get here on a cold node: a file lock lets one
+        of them export while the rest wait, and the export is built in a temp dir
+        and renamed into place, so nobody ever loads a half-written .onnx file.
+        """
+        from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+        name = f"{self.model_name.replace('/', '__')}__qint8_{self.quantization_config}"
+        model_dir = os.path.join(self.onnx_dir, name)
+        if os.path.isdir(model_dir):
+            return model_dir
+
+        os.makedirs(self.onnx_dir, exist_ok=True)
+        with open(os.path.join(self.onnx_dir, f".{name}.lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if os.path.isdir(model_dir):
+                # Another worker finished the export while we waited
+                return model_dir
+            print(f"[EmbeddingManager] Exporting {self.model_name} to ONNX + int8 ({self.quantization_config})...")
+            tmp_dir = tempfile.mkdtemp(prefix=f".{name}-", dir=self.onnx_dir)
+            try:
+                fp32_model = SentenceTransformer(self.model_name, backend="onnx")
+                fp32_model.save_pretrained(tmp_dir)
+                export_dynamic_quantized_onnx_model(fp32_model, self.quantization_config, tmp_dir)
+                os.replace(tmp_dir, model_dir)
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        return model_dir
+
     def _load_model(self):
+        # Imported here: sentence_transformers pulls in torch/transformers (seconds of import time)
+        from sentence_transformers import SentenceTransformer
         try:
-            print(f"[EmbeddingManager] Loading model: {self.model_name}")
-            self.model = SentenceTransformer(self.model_name)
+            print(f"[EmbeddingManager] Loading model: {self.model_name} (backend: {self.backend})")
+            if self.backend == "torch":
+                if self.intra_op_threads:
+                    import torch
+                    torch.set_num_threads(self.intra_op_threads)
+                self.model = SentenceTransformer(self.model_name)
+            elif self.backend == "onnx":
+                self.model = SentenceTransformer(self.model_name, backend="onnx", model_kwargs=self._onnx_model_kwargs())
+            else:
+                model_kwargs = self._onnx_model_kwargs()
+                model_kwargs["file_name"] = f"onnx/model_qint8_{self.quantization_config}.onnx"
+                self.model = SentenceTransformer(self._quantized_model_dir(), backend="onnx", model_kwargs=model_kwargs)
             print("[EmbeddingManager] Model loaded successfully.")
         except Exception as e:
             print(f"[EmbeddingManager] Error loading model: {e}")
             raise
 
-    def generate_embeddings(self, texts: List[str]) -> np.ndarray:
+    def generate_embeddings(self, texts: List[str], use_cache: bool = True) -> np.ndarray:
+        """
+        Encodes texts into a (len(texts), dim) matrix.
+        Set use_cache=False for bulk document chunks so they don't evict hot queries.
+        """
         if not self.model:
             raise ValueError("Model not loaded")
 
-        print(f"[EmbeddingManager] Generating embeddings for {len(texts)} text input(s)...")
-        embeddings = self.model.encode(texts, show_progress_bar=False)
-        return embeddings
\ No newline at end of file
+        if self.cache is None or not use_cache:
+            print(f"[EmbeddingManager] Generating embeddings for {len(texts)} text input(s)...")
+            embeddings = self.model.encode(texts, show_progress_bar=False)
+            return embeddings
+
+        # Cache entries are per backend: int8 vectors differ slightly from fp32 ones
+        cache_model = f"{self.model_name}:{self.backend}"
+        cached = [self.cache.get(cache_model, t) for t in texts]
+        missing = [i for i, vec in enumerate(cached) if vec is None]
+
+        if missing:
+            print(f"[EmbeddingManager] Generating embeddings for {len(missing)}/{len(texts)} text input(s) (cache miss)...")
+            fresh = self.model.encode([texts[i] for i in missing], show_progress_bar=False)
+            for i, vec in zip(missing, fresh):
+                self.cache.put(cache_model, texts[i], vec)
+                cached[i] = vec
+        else:
+            print(f"[EmbeddingManager] All {len(texts)} text input(s) served from cache.")
+
+        return np.vstack(cached).astype("float32") if cached else np.zeros((0, 0), dtype="float32")
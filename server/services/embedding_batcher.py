@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Deque, Dict, List, Tuple
+import numpy as np
+from services.embedding import EmbeddingManager
+
+class BatchingEmbedder:
+    """
+    Dynamic micro-batching in front of an EmbeddingManager.
+
+    Concurrent callers' texts are queued; a single worker thread waits up to
+    max_wait_ms (or until max_batch_size texts are queued), runs ONE
+    generate_embeddings call for everything collected and hands each caller its
+    own rows through a Future. Exposes the same generate_embeddings contract, so
+    it is a drop-in for EmbeddingManager wherever queries are embedded.
+    """
+
+    def __init__(self, embedding_manager: EmbeddingManager, max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        self.embedding_manager = embedding_manager
+        self.model_name = embedding_manager.model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue: Deque[Tuple[List[str], bool, Future]] = deque()
+        self._queued_texts = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._batch_sizes: Deque[int] = deque(maxlen=1024)
+        self._requests_per_batch: Deque[int] = deque(maxlen=1024)
+        self.total_batches = 0
+        self.total_requests = 0
+        self.max_queue_depth = 0
+
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, texts: List[str], use_cache: bool = True) -> Future:
+        future: Future = Future()
+        if not texts:
+            future.set_result(np.zeros((0, 0), dtype="float32"))
+            return future
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("BatchingEmbedder is closed")
+            self._queue.append((list(texts), use_cache, future))
+            self._queued_texts += len(texts)
+            self.total_requests += 1
+            self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+            self._cond.notify()
+        return future
+
+    def generate_embeddings(self, texts: List[str], use_cache: bool = True) -> np.ndarray:
+        return self.submit(texts, use_cache=use_cache).result()
+
+    def _collect(self) -> List[Tuple[List[str], bool, Future]]:
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            if not self._queue:
+                return []
+            # First request arrived: give concurrent callers a few ms to join the batch
+            deadline = time.monotonic() + self.max_wait
+            while self._queued_texts < self.max_batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch, size = [], 0
+            while self._queue and (not batch or size + len(self._queue[0][0]) <= self.max_batch_size):
+                texts, use_cache, future = self._queue.popleft()
+                batch.append((texts, use_cache, future))
+                size += len(texts)
+            self._queued_texts -= size
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                return
+            # Cache-bypassing requests (document chunks) are encoded separately so they don't fill the query cache
+            for use_cache in (True, False):
+                group = [req for req in batch if req[1] == use_cache]
+                if group:
+                    self._encode(group, use_cache)
+
+    def _encode(self, group: List[Tuple[List[str], bool, Future]], use_cache: bool):
+        all_texts = [t for texts, _, _ in group for t in texts]
+        try:
+            embeddings = np.asarray(self.embedding_manager.generate_embeddings(all_texts, use_cache=use_cache), dtype="float32")
+        except Exception as e:
+            for _, _, future in group:
+                future.set_exception(e)
+            return
+
+        with self._cond:
+            self.total_batches += 1
+            self._batch_sizes.append(len(all_texts))
+            self._requests_per_batch.append(len(group))
+
+        offset = 0
+        for texts, _, future in group:
+            future.set_result(embeddings[offset:offset + len(texts)])
+            offset += len(texts)
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            sizes = list(self._batch_sizes)
+            requests = list(self._requests_per_batch)
+            return {
+                "queue_depth": len(self._queue),
+                "queued_texts": self._queued_texts,
+                "max_queue_depth": self.max_queue_depth,
+                "total_requests": self.total_requests,
+                "total_batches": self.total_batches,
+                "mean_batch_size": float(np.mean(sizes)) if sizes else 0.0,
+                "max_batch_size": max(sizes) if sizes else 0,
+                "mean_requests_per_batch": float(np.mean(requests)) if requests else 0.0
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._worker.join(timeout=5)
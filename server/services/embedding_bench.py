@@ -0,0 +1,65 @@
+import argparse
+import time
+from typing import Dict, List
+import numpy as np
+from services.embedding import EmbeddingManager, BACKENDS
+
+SAMPLE_TEXTS = [
+    "Section 148 notice validity",
+    "Section 14A disallowance of expenditure relating to exempt income",
+    "Whether reassessment proceedings initiated after four years are barred by limitation",
+    "The Tribunal held that the addition under Section 68 was not sustainable as the assessee had proved the identity, creditworthiness and genuineness of the lenders.",
+    "Assessment under Section 153A in the absence of incriminating material found during search",
+    "Penalty under Section 271(1)(c) cannot be levied where the assessee made a bona fide claim"
+]
+
+
+def parity_check(reference: EmbeddingManager, candidate: EmbeddingManager, texts: List[str]) -> Dict[str, float]:
+    """Cosine similarity of candidate vectors against the float reference (1.0 = identical)."""
+    ref = np.asarray(reference.generate_embeddings(texts, use_cache=False), dtype="float32")
+    cand = np.asarray(candidate.generate_embeddings(texts, use_cache=False), dtype="float32")
+    ref /= np.linalg.norm(ref, axis=1, keepdims=True)
+    cand /= np.linalg.norm(cand, axis=1, keepdims=True)
+    cos = (ref * cand).sum(axis=1)
+    return {"min_cosine": float(cos.min()), "mean_cosine": float(cos.mean())}
+
+
+def throughput(manager: EmbeddingManager, texts: List[str], repeats: int = 3) -> Dict[str, float]:
+    manager.generate_embeddings(texts[:8], use_cache=False)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        manager.generate_embeddings(texts, use_cache=False)
+    elapsed = time.perf_counter() - start
+    return {"texts_per_sec": repeats * len(texts) / elapsed, "ms_per_text": 1000 * elapsed / (repeats * len(texts))}
+
+
+if __name__ == "__main__":
+    # python -m services.embedding_bench --backends onnx onnx-int8 --threads 4
+    parser = argparse.ArgumentParser(description="Embedding backend parity + throughput benchmark")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--backends", nargs="+", default=["onnx", "onnx-int8"], choices=BACKENDS)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--quantization-config", default="avx2")
+    parser.add_argument("--texts", type=int, default=512, help="Chunk-sized texts per throughput run")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="Fail if any vector drifts below this")
+    args = parser.parse_args()
+
+    corpus = [SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)] * 4 for i in range(args.texts)]
+    reference = EmbeddingManager(args.model, backend="torch")
+    baseline = throughput(reference, corpus)
+    print(f"[Benchmark] torch      {baseline['texts_per_sec']:.1f} texts/s  ({baseline['ms_per_text']:.2f} ms/text)")
+
+    failed = False
+    for backend in args.backends:
+        candidate = EmbeddingManager(args.model, backend=backend, intra_op_threads=args.threads, quantization_config=args.quantization_config)
+        parity = parity_check(reference, candidate, SAMPLE_TEXTS + corpus[:64])
+        speed = throughput(candidate, corpus)
+        ok = parity["min_cosine"] >= args.min_cosine
+        failed |= not ok
+        print(
+            f"[Benchmark] {backend:<10} {speed['texts_per_sec']:.1f} texts/s  ({speed['ms_per_text']:.2f} ms/text, "
+            f"{speed['texts_per_sec'] / baseline['texts_per_sec']:.2f}x)  parity min={parity['min_cosine']:.4f} "
+            f"mean={parity['mean_cosine']:.4f} {'OK' if ok else 'FAIL'}"
+        )
+
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import numpy as np
+
+class QueryEmbeddingCache:
+    """
+    Bounded, thread-safe LRU cache of query embeddings.
+    Keyed on (model_name, normalized query text). Evicts least-recently-used
+    entries once max_entries or max_bytes is exceeded, and drops entries older
+    than ttl_seconds on lookup.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: Optional[float] = 24 * 3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[np.ndarray, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        # all-MiniLM-L6-v2 is an uncased model, so casing/whitespace never change the vector
+        return " ".join(text.split()).lower()
+
+    def get(self, model_name: str, text: str) -> Optional[np.ndarray]:
+        key = (model_name, self.normalize(text))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            vector, created_at = entry
+            if self.ttl_seconds is not None and time.monotonic() - created_at > self.ttl_seconds:
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, model_name: str, text: str, vector: np.ndarray):
+        key = (model_name, self.normalize(text))
+        # Store a private read-only copy so callers can't mutate cached vectors
+        vector = np.array(vector, dtype="float32", copy=True)
+        vector.setflags(write=False)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (vector, time.monotonic())
+            self._bytes += vector.nbytes
+
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: Tuple[str, str]):
+        vector, _ = self._entries.pop(key)
+        self._bytes -= vector.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0
+            }
@@ -49,6 +49,7 @@ class GraphState(TypedDict):
     case_search_queries: List[str] # Queries for the Vector DB
     
     documents: List[str]       
+    context_blocks: List[dict] # {"section", "text", "score"} for the token-budget packer
     source_metadata: List[dict] 
     final_answer: str          
     
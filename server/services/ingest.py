@@ -2,21 +2,17 @@ import os
 import uuid
 import requests
 import tempfile
-import redis
 import traceback
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from embedding import EmbeddingManager
-from vectorStore import VectorStore
-
-# Initialize Redis
-redis_client = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
+from services.registry import get_embedding_manager, get_vector_store, get_redis, get_vector_uploader
 
 class IngestionService:
     def __init__(self):
         print("[IngestionService] Initializing models...")
-        self.embedding_manager = EmbeddingManager()
-        self.vector_store = VectorStore()
+        self.embedding_manager = get_embedding_manager()
+        self.vector_store = get_vector_store()
+        self.uploader = get_vector_uploader()
         
     def _download_file(self, url: str) -> str:
         """Downloads file from URL to a temporary path."""
@@ -67,7 +63,7 @@ class IngestionService:
             texts = [c.page_content for c in chunks]
             metadatas = [c.metadata for c in chunks]
             
-            embeddings = self.embedding_manager.generate_embeddings(texts)
+            embeddings = self.embedding_manager.generate_embeddings(texts, use_cache=False)
             
             vectors_to_upload = []
             for i, text in enumerate(texts):
@@ -77,6 +73,7 @@ class IngestionService:
                 meta["text"] = text       
                 meta["filename"] = filename
                 meta["source"] = file_url 
+                meta["chunk_index"] = i
 
                 vectors_to_upload.append({
                     "key": str(uuid.uuid4()),
@@ -86,11 +83,7 @@ class IngestionService:
 
             # 4. Upload to S3
             print(f"[Ingestion] Uploading {len(vectors_to_upload)} vectors...")
-            self.vector_store.s3vectors.put_vectors(
-                vectorBucketName=self.vector_store.bucket_name,
-                indexName="file-upload-index",
-                vectors=vectors_to_upload
-            )
+            self.uploader.upload(vectors_to_upload)
 
             # 5. Update Redis Manifest
             preview_text = raw_docs[0].page_content[:600].replace("\n", " ")
@@ -99,7 +92,7 @@ class IngestionService:
             redis_key = f"manifest:{thread_id}"
             
             # Append to existing manifest if user uploads multiple files in one thread
-            existing_manifest = redis_client.get(redis_key) or ""
+            existing_manifest = get_redis().get(redis_key) or ""
             updated_manifest = existing_manifest + new_manifest_entry
             
             # redis_client.setex(redis_key, 86400, updated_manifest) # 24hr TTL
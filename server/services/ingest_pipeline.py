@@ -0,0 +1,240 @@
+import re
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from typing import Any, BinaryIO, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Union
+import numpy as np
+from services.registry import get_redis
+from services.chunk_cache import ChunkEmbeddingCache
+from services.pdf_extract import PageExtractor, iter_stream_pages, page_document
+from services.vector_uploader import VectorUploader
+from services.document_registry import DocumentRegistry, file_sha256
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class IngestionPipeline:
+    """
+    Ingests one downloaded PDF (a path or an in-memory stream) for a thread as a stream:
+    page -> chunks -> embed batch -> put_vectors batch, then one thread index
+    mirror and the router's manifest entry.
+
+    Pages are parsed lazily, exactly once, and chunked as they arrive. At most
+    `upload_window` embedded batches wait on the network; when the window is full
+    the producer blocks (backpressure), so in-flight work is a few batches no matter
+    how many pages the document has; the thread-index rows are appended to disk
+    per batch and merged into the thread's index once at the end. put_vectors goes through the shared VectorUploader (size-aware
+    batches, throttling retries).
+
+    With a DocumentRegistry, a PDF whose bytes the user already ingested in
+    another thread is attached to the new thread instead of being re-processed.
+    With a PageExtractor, page text is extracted on a process pool instead of
+    the ingesting thread. With a ChunkEmbeddingCache, only chunks whose text was never embedded before
+    (e.g. the amended parts of a revised filing) reach the model.
+    """
+
+    def __init__(
+        self,
+        embedding_manager,
+        vector_store,
+        uploader: VectorUploader,
+        chunk_size: int = 800,
+        chunk_overlap: int = 100,
+        preview_chars: int = 1000,
+        embed_batch_size: int = 64,
+        upload_window: int = 2,
+        documents: Optional[DocumentRegistry] = None,
+        chunk_cache: Optional[ChunkEmbeddingCache] = None,
+        page_extractor: Optional[PageExtractor] = None
+    ):
+        # langchain_community is slow to import; only ingestion needs it
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+        self.embedding_manager = embedding_manager
+        self.vector_store = vector_store
+        self.uploader = uploader
+        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self.preview_chars = preview_chars
+        self.embed_batch_size = embed_batch_size
+        self.upload_window = max(1, upload_window)
+        self.documents = documents
+        self.chunk_cache = chunk_cache
+        self.page_extractor = page_extractor
+
+    def iter_pages(self, path: Union[str, BinaryIO]) -> Iterator[Any]:
+        if self.page_extractor is not None:
+            # Page ranges extracted on the shared process pool, yielded in page order
+            return self.page_extractor.iter_pages(path)
+        if not isinstance(path, str):
+            return (page_document(text, "", page, total) for page, total, text in iter_stream_pages(path))
+        from langchain_community.document_loaders import PyPDFLoader
+        return PyPDFLoader(path).lazy_load()
+
+    def manifest_preview(self, page) -> Optional[str]:
+        text = page.page_content.strip()
+        return text[:self.preview_chars].replace("\n", " ") if text else None
+
+    @staticmethod
+    def vector_key(scope: str, digest: str, chunk_index: int) -> str:
+        # Deterministic keys: a retried job overwrites its partial upload instead of duplicating it,
+        # while a revised PDF re-uploaded under the same name (new bytes) gets keys of its own
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{scope}|{digest}|{chunk_index}"))
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        if self.chunk_cache is None:
+            return np.asarray(self.embedding_manager.generate_embeddings(texts, use_cache=False), dtype="float32")
+
+        try:
+            cached = self.chunk_cache.get_many(texts)
+        except Exception as e:
+            print(f"[ChunkCache] Lookup failed, embedding everything: {e}")
+            cached = [None] * len(texts)
+        missing = [i for i, vec in enumerate(cached) if vec is None]
+        if missing:
+            fresh = np.asarray(self.embedding_manager.generate_embeddings([texts[i] for i in missing], use_cache=False), dtype="float32")
+            try:
+                self.chunk_cache.put_many([texts[i] for i in missing], fresh)
+            except Exception as e:
+                print(f"[ChunkCache] Store failed: {e}")
+            for i, vec in zip(missing, fresh):
+                cached[i] = vec
+        return np.vstack(cached)
+
+    def _begin_mirror(self, thread_id: str, filename: str, fresh_thread: bool):
+        """
+        Starts the per-thread index mirror (so file_search skips the remote filtered
+        query). Batches are appended to an on-disk staging area as they are embedded
+        and merged into the thread's spill ONCE at the end: per-batch merges would
+        make every worker reload the spill and be quadratic in the file size.
+        """
+        if self.vector_store.thread_index is None:
+            return None
+        try:
+            return self.vector_store.thread_index.begin(thread_id, filename, fresh_thread=fresh_thread)
+        except Exception as e:
+            print(f"!!! Thread index update failed (remote search still works): {e}")
+            return None
+
+    def ingest(self, path: Union[str, BinaryIO], thread_id: str, source: str, filename: str, progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        start = time.perf_counter()
+        # Read before this file's manifest entry exists: does the thread hold files the local index never saw?
+        fresh_thread = not get_redis().hget(f"rag_session:{thread_id}", "file_manifest")
+
+        digest = file_sha256(path)
+        # Vectors are shared by the owner's threads through the registry, otherwise private to this thread
+        scope, users = thread_id, thread_id
+        if self.documents is not None:
+            doc = self.documents.attach(thread_id, digest, fresh_thread=fresh_thread, filename=filename)
+            if doc is not None:
+                if doc.get("preview"):
+                    update_manifest(thread_id, filename, f"FILENAME: {filename}\nPREVIEW: {doc['preview']}\n\n")
+                seconds = time.perf_counter() - start
+                print(f">>> [Ingest Task] {filename}: identical to an earlier upload; attached {doc['chunks']} vectors in {seconds:.2f}s.")
+                return {"pages": 0, "chunks": int(doc["chunks"]), "uploaded": 0, "deduplicated": True, "seconds": seconds}
+            # Re-ingesting a document whose vectors went missing: keep the other threads attached to it
+            scope = DocumentRegistry.owner(thread_id)
+            users = sorted(self.documents.threads(thread_id, digest) | {thread_id})
+
+        stats = {"pages": 0, "chunks": 0, "uploaded": 0}
+        preview: List[str] = []
+
+        def chunk_stream():
+            for page in self.iter_pages(path):
+                stats["pages"] += 1
+                # Tag vectors with S3 URL so citations work later
+                page.metadata["source"] = source
+                page.metadata["filename"] = filename
+                page.metadata["thread_id"] = thread_id  # Critical for isolation
+                if not preview:
+                    text = self.manifest_preview(page)
+                    if text:
+                        preview.append(text)
+                yield from self.text_splitter.split_documents([page])
+
+        def finish(future: Future):
+            stats["uploaded"] += future.result()
+            if progress:
+                progress(dict(stats))
+
+        in_flight: Deque[Future] = deque()
+        # Thread-index mirror, committed once the whole file is uploaded
+        mirror = self._begin_mirror(thread_id, filename, fresh_thread)
+        with ThreadPoolExecutor(max_workers=self.upload_window, thread_name_prefix="ingest-upload") as pool:
+            try:
+                for batch in batched(chunk_stream(), self.embed_batch_size):
+                    first_index = stats["chunks"]
+                    stats["chunks"] += len(batch)
+                    embeddings = self._embed([c.page_content for c in batch])
+                    vectors = [
+                        {
+                            "key": self.vector_key(scope, digest, first_index + j),
+                            "data": {"float32": embeddings[j].tolist()},
+                            "metadata": {**chunk.metadata, "text": chunk.page_content, "user": users, "chunk_index": first_index + j}
+                        }
+                        for j, chunk in enumerate(batch)
+                    ]
+                    # Backpressure: stop parsing/embedding while the upload window is full
+                    while len(in_flight) >= self.upload_window:
+                        finish(in_flight.popleft())
+                    # Split by count/bytes and sent concurrently; raises only if a batch failed for good
+                    in_flight.append(pool.submit(self.uploader.upload, vectors))
+                    if mirror is not None:
+                        try:
+                            mirror.append(embeddings, [{"key": v["key"], "metadata": v["metadata"]} for v in vectors])
+                        except Exception as e:
+                            print(f"!!! Thread index update failed (remote search still works): {e}")
+                            mirror.abort()
+                            mirror = None
+                while in_flight:
+                    finish(in_flight.popleft())
+            except Exception:
+                for future in in_flight:
+                    future.cancel()
+                if mirror is not None:
+                    mirror.abort()
+                raise
+
+        print(f">>> [Ingest Task] Uploaded {stats['uploaded']} vectors.")
+        if mirror is not None:
+            try:
+                mirror.commit()
+            except Exception as e:
+                print(f"!!! Thread index update failed (remote search still works): {e}")
+        if preview:
+            update_manifest(thread_id, filename, f"FILENAME: {filename}\nPREVIEW: {preview[0]}\n\n")
+        if self.documents is not None:
+            keys = [self.vector_key(scope, digest, i) for i in range(stats["chunks"])]
+            self.documents.register(thread_id, digest, keys, filename, source, preview[0] if preview else "")
+
+        stats["seconds"] = time.perf_counter() - start
+        print(f">>> [Ingest Task] {filename}: {stats['pages']} pages, {stats['chunks']} chunks streamed in {stats['seconds']:.2f}s.")
+        return stats
+
+
+MANIFEST_FILENAME_PATTERN = re.compile(r"^FILENAME: (.+)$", re.MULTILINE)
+
+def manifest_files(thread_id: str) -> List[str]:
+    """Filenames listed in the thread's manifest (every file ingested or attached, on any node)."""
+    return MANIFEST_FILENAME_PATTERN.findall(get_redis().hget(f"rag_session:{thread_id}", "file_manifest") or "")
+
+
+def update_manifest(thread_id: str, filename: str, entry: str):
+    """Appends a file's entry to the thread's manifest in Redis (once per filename)."""
+    key = f"rag_session:{thread_id}"
+    current_manifest = get_redis().hget(key, "file_manifest") or ""
+
+    # Simple dedup
+    if filename not in current_manifest:
+        updated_manifest = (current_manifest + "\n\n" + entry).strip()
+        get_redis().hset(key, "file_manifest", updated_manifest)
+        print(f">>> [Ingest Task] Redis Manifest Updated.")
+    else:
+        print(f">>> [Ingest Task] Manifest already exists. Skipping.")
@@ -0,0 +1,239 @@
+import argparse
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+QUEUE_KEY = "ingest:queue"
+PROCESSING_KEY = "ingest:processing"
+DELAYED_KEY = "ingest:delayed"
+EVENTS_CHANNEL = "ingest:events"
+FINISHED_JOB_TTL = 7 * 24 * 3600
+
+class IngestionQueue:
+    """
+    Durable ingestion job queue on Redis.
+
+      ingest:job:<id>         hash: thread_id, file_name, status, attempts, error, timestamps
+      ingest:thread:<thread>  set of the thread's job ids
+      ingest:queue            list of ready job ids (LPUSH / BRPOPLPUSH)
+      ingest:processing       list of job ids a worker has claimed
+      ingest:delayed          zset of job ids waiting out a retry backoff (score = ready time)
+
+    Job ids are derived from (thread_id, file_name, version), so repeating an
+    upload-complete call for the same object never queues the file twice.
+    Status changes are published on ingest:events for WebSocket relays.
+    """
+
+    def __init__(self, redis_client, max_attempts: int = 3, backoff_seconds: float = 10.0, visibility_timeout: float = 900.0):
+        self.redis = redis_client
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        # A claimed job with no heartbeat for this long belongs to a dead worker
+        self.visibility_timeout = visibility_timeout
+
+    @staticmethod
+    def job_id(thread_id: str, file_name: str, version: str = "") -> str:
+        return hashlib.sha256(f"{thread_id}|{file_name}|{version}".encode()).hexdigest()[:32]
+
+    @staticmethod
+    def _job_key(job_id: str) -> str:
+        return f"ingest:job:{job_id}"
+
+    def _set_status(self, job_id: str, status: str, **fields):
+        key = self._job_key(job_id)
+        self.redis.hset(key, mapping={"status": status, "updated_at": time.time(), **fields})
+        if status in ("done", "failed"):
+            self.redis.expire(key, FINISHED_JOB_TTL)
+        else:
+            self.redis.persist(key)
+        job = self.get(job_id) or {}
+        self.redis.publish(EVENTS_CHANNEL, json.dumps({
+            "job_id": job_id,
+            "thread_id": job.get("thread_id"),
+            "file_name": job.get("file_name"),
+            "status": status,
+            "attempts": job.get("attempts", 0),
+            "error": job.get("error", "")
+        }))
+
+    # --- PRODUCER SIDE ---
+
+    def enqueue(self, thread_id: str, file_name: str, version: str = "") -> Tuple[str, str]:
+        """Queues a file for ingestion. Returns (job_id, status); existing live jobs are returned as-is."""
+        job_id = self.job_id(thread_id, file_name, version)
+        key = self._job_key(job_id)
+
+        if not self.redis.hsetnx(key, "status", "queued"):
+            status = self.redis.hget(key, "status")
+            if status != "failed":
+                print(f"[IngestQueue] Job {job_id} already {status}; not re-queued.")
+                return job_id, status
+            print(f"[IngestQueue] Re-queuing failed job {job_id}.")
+
+        self.redis.hset(key, mapping={"thread_id": thread_id, "file_name": file_name, "attempts": 0, "error": "", "enqueued_at": time.time()})
+        self.redis.sadd(f"ingest:thread:{thread_id}", job_id)
+        self._set_status(job_id, "queued")
+        self.redis.lpush(QUEUE_KEY, job_id)
+        print(f"[IngestQueue] Queued job {job_id} for {file_name}")
+        return job_id, "queued"
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.redis.hgetall(self._job_key(job_id))
+        if not job:
+            return None
+        job["job_id"] = job_id
+        job["attempts"] = int(job.get("attempts", 0))
+        return job
+
+    def thread_jobs(self, thread_id: str) -> list:
+        jobs = [self.get(job_id) for job_id in self.redis.smembers(f"ingest:thread:{thread_id}")]
+        return sorted([j for j in jobs if j], key=lambda j: float(j.get("enqueued_at", 0)))
+
+    def listen_events(self) -> Iterator[Dict[str, Any]]:
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(EVENTS_CHANNEL)
+        for message in pubsub.listen():
+            if message.get("type") == "message":
+                yield json.loads(message["data"])
+
+    # --- WORKER SIDE ---
+
+    def claim(self, timeout: int = 5) -> Optional[str]:
+        self._promote_delayed()
+        return self.redis.brpoplpush(QUEUE_KEY, PROCESSING_KEY, timeout=timeout)
+
+    def _promote_delayed(self):
+        for job_id in self.redis.zrangebyscore(DELAYED_KEY, 0, time.time()):
+            # zrem decides the race between workers promoting the same job
+            if self.redis.zrem(DELAYED_KEY, job_id):
+                self._set_status(job_id, "queued")
+                self.redis.lpush(QUEUE_KEY, job_id)
+
+    def heartbeat(self, job_id: str):
+        self.redis.hset(self._job_key(job_id), "updated_at", time.time())
+
+    def progress(self, job_id: str, stats: Dict[str, Any]):
+        """Records streaming progress (pages/chunks/uploaded) on the job; doubles as a heartbeat."""
+        self.redis.hset(self._job_key(job_id), mapping={**stats, "updated_at": time.time()})
+        job = self.get(job_id) or {}
+        self.redis.publish(EVENTS_CHANNEL, json.dumps({
+            "job_id": job_id, "thread_id": job.get("thread_id"), "file_name": job.get("file_name"), "status": "running", **stats
+        }))
+
+    def complete(self, job_id: str):
+        self.redis.lrem(PROCESSING_KEY, 1, job_id)
+        self._set_status(job_id, "done", error="")
+
+    def fail(self, job_id: str, error: str):
+        attempts = self.redis.hincrby(self._job_key(job_id), "attempts", 1)
+        self.redis.lrem(PROCESSING_KEY, 1, job_id)
+        if attempts < self.max_attempts:
+            delay = self.backoff_seconds * (2 ** (attempts - 1))
+            self._set_status(job_id, "retrying", error=error, retry_at=time.time() + delay)
+            self.redis.zadd(DELAYED_KEY, {job_id: time.time() + delay})
+            print(f"[IngestQueue] Job {job_id} failed (attempt {attempts}/{self.max_attempts}); retrying in {delay:.0f}s.")
+        else:
+            self._set_status(job_id, "failed", error=error)
+            print(f"[IngestQueue] Job {job_id} failed permanently: {error}")
+
+    def requeue_stale(self):
+        """Returns jobs claimed by workers that stopped heartbeating to the queue."""
+        now = time.time()
+        for job_id in self.redis.lrange(PROCESSING_KEY, 0, -1):
+            job = self.get(job_id)
+            if job is None or float(job.get("updated_at", 0)) < now - self.visibility_timeout:
+                if self.redis.lrem(PROCESSING_KEY, 1, job_id) and job is not None:
+                    print(f"[IngestQueue] Re-queuing stale job {job_id}.")
+                    self._set_status(job_id, "queued")
+                    self.redis.lpush(QUEUE_KEY, job_id)
+
+
+class IngestionWorker:
+    """
+    Claims jobs and runs handler(thread_id, file_name, progress=callback);
+    an exception from the handler triggers a retry.
+    """
+
+    def __init__(self, queue: IngestionQueue, handler: Callable[..., Any], heartbeat_interval: float = 30.0):
+        self.queue = queue
+        self.handler = handler
+        self.heartbeat_interval = heartbeat_interval
+        self._stop = threading.Event()
+
+    def _run_job(self, job_id: str):
+        job = self.queue.get(job_id)
+        if job is None:
+            self.queue.redis.lrem(PROCESSING_KEY, 1, job_id)
+            return
+        self.queue._set_status(job_id, "running")
+
+        done = threading.Event()
+        def beat():
+            while not done.wait(self.heartbeat_interval):
+                self.queue.heartbeat(job_id)
+        threading.Thread(target=beat, daemon=True).start()
+
+        start = time.perf_counter()
+        try:
+            self.handler(job["thread_id"], job["file_name"], progress=lambda stats: self.queue.progress(job_id, stats))
+            self.queue.complete(job_id)
+            print(f"[IngestWorker] Job {job_id} done in {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            self.queue.fail(job_id, f"{type(e).__name__}: {e}")
+        finally:
+            done.set()
+
+    def run(self):
+        print("[IngestWorker] Waiting for jobs...")
+        last_stale_check = 0.0
+        while not self._stop.is_set():
+            if time.monotonic() - last_stale_check > 60:
+                self.queue.requeue_stale()
+                last_stale_check = time.monotonic()
+            try:
+                job_id = self.queue.claim()
+            except Exception as e:
+                print(f"[IngestWorker] Queue unavailable: {e}")
+                time.sleep(5)
+                continue
+            if job_id:
+                self._run_job(job_id)
+
+    def stop(self):
+        self._stop.set()
+
+
+if __name__ == "__main__":
+    # python -m services.ingest_queue --concurrency 2
+    parser = argparse.ArgumentParser(description="Ingestion worker process")
+    parser.add_argument(
+        "--concurrency", type=int, default=None,
+        help="Jobs processed in parallel (threads sharing one model; default: INGEST_CONCURRENCY, else one per PDF pool process)"
+    )
+    parser.add_argument("--max-attempts", type=int, default=3)
+    args = parser.parse_args()
+
+    from services import registry
+    from services.chat_service import run_ingestion_task
+
+    # Only what ingestion needs: no LLM clients or graph in a worker
+    registry.get_ingest_pipeline()
+    queue = IngestionQueue(registry.get_redis(), max_attempts=args.max_attempts)
+    concurrency = args.concurrency or registry.ingest_concurrency()
+    print(f"[IngestWorker] Running {concurrency} concurrent jobs.")
+    workers = [IngestionWorker(queue, run_ingestion_task) for _ in range(concurrency)]
+    threads = [threading.Thread(target=w.run, name=f"ingest-worker-{i}") for i, w in enumerate(workers)]
+    for t in threads:
+        t.start()
+    try:
+        for t in threads:
+            t.join()
+    except KeyboardInterrupt:
+        for w in workers:
+            w.stop()
+        for t in threads:
+            t.join()
+    finally:
+        registry.shutdown()
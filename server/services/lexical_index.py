@@ -0,0 +1,149 @@
+import hashlib
+import math
+import os
+import re
+from collections import defaultdict
+from typing import Any, Callable, Dict, Hashable, List, Sequence, Tuple
+import numpy as np
+
+# Keeps statute tokens like "14a", "153a", "10(23c)" -> "10", "23c" intact
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def token_hash(token: str) -> int:
+    # Fixed-width vocabulary ids, so the term list is a sorted uint64 array that can be mmapped
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+
+
+def case_document_text(metadata: Dict[str, Any]) -> str:
+    """Lexical view of a case record: case metadata + issue + reasoning."""
+    case_meta = metadata.get("case_metadata", [])
+    if not isinstance(case_meta, list):
+        case_meta = [case_meta]
+    parts = [str(p) for p in case_meta] + [
+        str(metadata.get("main_issue", "")),
+        str(metadata.get("decision_reasoning", ""))
+    ]
+    return " ".join(parts)
+
+
+def chunk_document_text(metadata: Dict[str, Any]) -> str:
+    """Lexical view of an uploaded file chunk."""
+    return f"{metadata.get('filename', '')} {metadata.get('text', '')}"
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed list of documents.
+
+    Postings are stored CSR-style in flat NumPy arrays: sorted term hashes,
+    per-term [start, end) pointers into doc-id / term-frequency arrays, per-term
+    idf and per-doc length norms. save() writes them as .npy files that load()
+    memory-maps, so every worker process on a node shares one copy.
+    """
+
+    FILES = ("terms", "ptr", "ids", "tfs", "idf", "norm")
+
+    def __init__(self, documents: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.n_docs = len(documents)
+
+        postings = defaultdict(lambda: defaultdict(int))
+        doc_lens = np.zeros(self.n_docs, dtype="float32")
+        for doc_id, text in enumerate(documents):
+            tokens = tokenize(text)
+            doc_lens[doc_id] = len(tokens)
+            for tok in tokens:
+                postings[tok][doc_id] += 1
+
+        avg_len = float(doc_lens.mean()) if self.n_docs else 0.0
+        # Per-doc length normalization is query independent, so precompute it
+        self._norm = self.k1 * (1 - self.b + self.b * doc_lens / (avg_len or 1.0))
+
+        # Merge by hash first (a 64-bit collision just pools two rare terms)
+        by_hash: Dict[int, Dict[int, int]] = defaultdict(dict)
+        for tok, docs in postings.items():
+            merged = by_hash[token_hash(tok)]
+            for doc_id, tf in docs.items():
+                merged[doc_id] = merged.get(doc_id, 0) + tf
+
+        self._terms = np.fromiter(sorted(by_hash), dtype="uint64", count=len(by_hash))
+        self._ptr = np.zeros(len(self._terms) + 1, dtype="int64")
+        self._idf = np.zeros(len(self._terms), dtype="float32")
+        ids, tfs = [], []
+        for t, term in enumerate(self._terms.tolist()):
+            docs = by_hash[term]
+            ids.append(np.fromiter(docs.keys(), dtype="int64", count=len(docs)))
+            tfs.append(np.fromiter(docs.values(), dtype="float32", count=len(docs)))
+            self._ptr[t + 1] = self._ptr[t] + len(docs)
+            self._idf[t] = math.log(1 + (self.n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+        self._ids = np.concatenate(ids) if ids else np.zeros(0, dtype="int64")
+        self._tfs = np.concatenate(tfs) if tfs else np.zeros(0, dtype="float32")
+
+    def save(self, directory: str, prefix: str = "bm25_"):
+        for name in self.FILES:
+            np.save(os.path.join(directory, f"{prefix}{name}.npy"), getattr(self, f"_{name}"))
+        np.save(os.path.join(directory, f"{prefix}params.npy"), np.asarray([self.k1, self.b], dtype="float64"))
+
+    @classmethod
+    def exists(cls, directory: str, prefix: str = "bm25_") -> bool:
+        return all(os.path.exists(os.path.join(directory, f"{prefix}{name}.npy")) for name in cls.FILES + ("params",))
+
+    @classmethod
+    def load(cls, directory: str, prefix: str = "bm25_") -> "BM25Index":
+        index = cls.__new__(cls)
+        for name in cls.FILES:
+            setattr(index, f"_{name}", np.load(os.path.join(directory, f"{prefix}{name}.npy"), mmap_mode="r"))
+        index.k1, index.b = (float(v) for v in np.load(os.path.join(directory, f"{prefix}params.npy")))
+        index.n_docs = len(index._norm)
+        return index
+
+    def _term(self, token: str) -> int:
+        h = np.uint64(token_hash(token))
+        t = int(np.searchsorted(self._terms, h))
+        return t if t < len(self._terms) and self._terms[t] == h else -1
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        """Returns [(doc_id, score)] best first; docs sharing no term are never returned."""
+        scores = np.zeros(self.n_docs, dtype="float32")
+        for tok in set(tokenize(query)):
+            t = self._term(tok)
+            if t < 0:
+                continue
+            ids = self._ids[self._ptr[t]:self._ptr[t + 1]]
+            tfs = self._tfs[self._ptr[t]:self._ptr[t + 1]]
+            scores[ids] += self._idf[t] * tfs * (self.k1 + 1) / (tfs + self._norm[ids])
+
+        matched = np.flatnonzero(scores)
+        if len(matched) == 0:
+            return []
+        best = matched[np.argsort(-scores[matched], kind="stable")[:k]]
+        return [(int(i), float(scores[i])) for i in best]
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Dict[str, Any]]],
+    key_fn: Callable[[Dict[str, Any]], Hashable],
+    rrf_k: int = 60
+) -> List[Dict[str, Any]]:
+    """
+    Fuses ranked hit lists with RRF: score(d) = sum over lists of 1 / (rrf_k + rank).
+    Hits whose key_fn is falsy are skipped. Returns shallow copies carrying "score",
+    best first; ties keep first-seen order so the output is deterministic.
+    """
+    scores: Dict[Hashable, float] = {}
+    docs: Dict[Hashable, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = key_fn(doc)
+            if not key:
+                continue
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            docs.setdefault(key, doc)
+
+    ordered = sorted(docs, key=lambda key: -scores[key])
+    return [{**docs[key], "score": scores[key]} for key in ordered]
@@ -0,0 +1,37 @@
+from typing import List
+import numpy as np
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.atleast_2d(np.asarray(matrix, dtype="float32"))
+    return matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12)
+
+
+def mmr_select(query_vectors: np.ndarray, candidate_vectors: np.ndarray, k: int, lambda_mult: float = 0.5) -> List[int]:
+    """
+    Maximal Marginal Relevance over candidate vectors.
+
+    relevance(d) = max cosine to any of the turn's queries
+    score(d)     = lambda * relevance(d) - (1 - lambda) * max cosine to already selected docs
+
+    lambda_mult=1.0 is pure relevance order; lower values favour diversity.
+    Returns candidate indices in selection order.
+    """
+    n = len(candidate_vectors)
+    if n == 0 or k <= 0:
+        return []
+
+    candidates = _unit_rows(candidate_vectors)
+    relevance = (candidates @ _unit_rows(query_vectors).T).max(axis=1)
+    similarity = candidates @ candidates.T
+
+    selected: List[int] = []
+    redundancy = np.zeros(n, dtype="float32")
+    available = np.ones(n, dtype=bool)
+    for _ in range(min(k, n)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        pick = int(np.argmax(scores))
+        selected.append(pick)
+        available[pick] = False
+        redundancy = np.maximum(redundancy, similarity[pick]) if len(selected) > 1 else similarity[pick].copy()
+    return selected
@@ -1,5 +1,4 @@
 import datetime
-from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import SystemMessage, HumanMessage
 from services.graph_schema import (
@@ -8,23 +7,18 @@ from services.graph_schema import (
     RouteQueryFull, 
     RouteQueryRestricted
 )
-from configuration import get_api_key
-from services.ragRetreiver import RAGRetriever
-from services.vectorStore import VectorStore
-from services.embedding import EmbeddingManager
+from services.registry import (
+    get_llm_router,
+    get_llm_gen,
+    get_rag_retriever,
+    get_context_packer
+)
+from services.context_packer import relevance_scores
 from pydantic import BaseModel, Field
+import numpy as np
 import json
 
-groq_api_key = get_api_key()
-
-# Core Components
-llm_router = ChatGroq(api_key=groq_api_key, model="openai/gpt-oss-120b", temperature=0)
-llm_gen = ChatGroq(api_key=groq_api_key, model="openai/gpt-oss-120b", temperature=0.1, max_tokens=4096)
-
-# Initialize RAG Logic
-embedding_manager = EmbeddingManager()
-vector_store = VectorStore()
-rag_retriever = RAGRetriever(vector_store, embedding_manager)
+# Models, clients and the retriever are shared process-wide via services.registry
 
 # --- NODE 1: ROUTER ---
 def router_node(state: GraphState):
@@ -46,7 +40,7 @@ def router_node(state: GraphState):
     
     if manifest:
         print("[Router] Mode: FULL (Files Detected)")
-        structured_llm = llm_router.with_structured_output(RouteQueryFull)
+        structured_llm = get_llm_router().with_structured_output(RouteQueryFull)
         
         system_prompt = f"""You are a legal query orchestrator.
 
@@ -71,7 +65,7 @@ def router_node(state: GraphState):
         """
     else:
         print("[Router] Mode: RESTRICTED")
-        structured_llm = llm_router.with_structured_output(RouteQueryRestricted)
+        structured_llm = get_llm_router().with_structured_output(RouteQueryRestricted)
         system_prompt = f"""You are a Legal Search Optimizer.
         
         {db_schema}
@@ -119,32 +113,46 @@ def retriever_node(state: GraphState):
     thread_id = state.get("thread_id") 
     
     documents = []
+    context_blocks = []
     source_metadata_list = []
+
+    # Every query known now is encoded in ONE model call; Step 2's generated
+    # queries are the only ones embedded later
+    retriever = get_rag_retriever()
+    search_files = route in ["file_search", "hybrid_search"]
+    search_cases = route in ["case_search", "hybrid_search"]
+    query_embs = retriever.embed_queries(file_qs if search_files else [], initial_case_qs if search_cases else [])
     
     # ---------------------------------------------------------
     # STEP 1: RETRIEVE FILE CONTENT
     # ---------------------------------------------------------
     file_results = []
-    if route in ["file_search", "hybrid_search"]:
+    if search_files:
         print(f"   [Step 1] Searching User File: {file_qs}")
-        results_dict = rag_retriever.retrieve_split(
-            file_queries=file_qs, case_queries=[], thread_id=thread_id, top_k=5
+        results_dict = retriever.retrieve_split_with_vectors(
+            file_queries=file_qs, file_vectors=query_embs["files"], case_queries=[], case_vectors=None,
+            thread_id=thread_id, top_k=5, question=state["question"]
         )
+        # Already reranked per chunk inside the retriever (before chunks are merged per file)
         file_results = results_dict.get("files", [])
         
         if file_results:
-            documents.append("### FACTS FROM UPLOADED FILE")
-            for res in file_results:
+            section = "### FACTS FROM UPLOADED FILE"
+            documents.append(section)
+            for res, score in zip(file_results, relevance_scores(file_results)):
                 meta = res.get("metadata", {})
                 content = meta.get("text", "")
                 if content:
-                    documents.append(f"SOURCE DOC: {meta.get('filename')}\nCONTENT: {content}")
+                    block = f"SOURCE DOC: {meta.get('filename')}\nCONTENT: {content}"
+                    documents.append(block)
+                    context_blocks.append({"section": section, "text": block, "score": score})
                     source_metadata_list.append({"full_path": meta.get('source'), "metadata": meta})
 
     # ---------------------------------------------------------
     # STEP 2: DYNAMICALLY GENERATE CASE QUERIES (MANUAL PARSE MODE)
     # ---------------------------------------------------------
-    final_case_qs = initial_case_qs 
+    final_case_qs = list(initial_case_qs)
+    dynamic_queries = []
     
     if route == "hybrid_search" and file_results:
         print("   [Step 2] Analyzing File Content to refine Case Search...")
@@ -168,7 +176,7 @@ def retriever_node(state: GraphState):
         
         try:
             # 1. Invoke as standard chat
-            response = llm_router.invoke([HumanMessage(content=query_prompt)])
+            response = get_llm_router().invoke([HumanMessage(content=query_prompt)])
             raw_content = response.content.strip()
             
             # 2. Clean Markdown
@@ -196,16 +204,25 @@ def retriever_node(state: GraphState):
     # ---------------------------------------------------------
     # STEP 3: RETRIEVE CASES
     # ---------------------------------------------------------
-    if route in ["case_search", "hybrid_search"] and final_case_qs:
+    if search_cases and final_case_qs:
         print(f"   [Step 3] Searching Case Law DB: {final_case_qs}")
+
+        case_vectors = query_embs["cases"]
+        if dynamic_queries:
+            new_vectors = retriever.embed_queries([], dynamic_queries)["cases"]
+            case_vectors = new_vectors if case_vectors is None else np.vstack([case_vectors, new_vectors])
         
-        results_dict = rag_retriever.retrieve_split(
-            file_queries=[], case_queries=final_case_qs, thread_id=thread_id, top_k=5
+        results_dict = retriever.retrieve_split_with_vectors(
+            file_queries=[], file_vectors=None, case_queries=final_case_qs, case_vectors=case_vectors,
+            thread_id=thread_id, top_k=5, question=state["question"]
         )
         
-        if results_dict.get("cases"):
-            documents.append("### RELEVANT LEGAL PRECEDENTS (EXTERNAL DB)")
-            for res in results_dict["cases"]:
+        case_results = results_dict.get("cases", [])
+
+        if case_results:
+            section = "### RELEVANT LEGAL PRECEDENTS (EXTERNAL DB)"
+            documents.append(section)
+            for res, score in zip(case_results, relevance_scores(case_results)):
                 meta = res.get("metadata", {})
                 
                 # --- METADATA EXTRACTION ---
@@ -237,6 +254,7 @@ def retriever_node(state: GraphState):
                 if reasoning != "N/A":
                     block = (f"CASE: {case_name}\nISSUE: {main_issue}\nOUTCOME: {outcome}\nREASONING: {reasoning}")
                     documents.append(block)
+                    context_blocks.append({"section": section, "text": block, "score": score})
                     
                     # Store the formatted path for the API Response
                     source_metadata_list.append({
@@ -245,21 +263,10 @@ def retriever_node(state: GraphState):
                     })
 
     print(f"[Retriever] Retrieved {len(documents)} context blocks.")
-    return {"documents": documents, "source_metadata": source_metadata_list}
+    return {"documents": documents, "context_blocks": context_blocks, "source_metadata": source_metadata_list}
 
-# --- NODE 3: RAG GENERATOR (Unchanged) ---
-def generate_rag_node(state: GraphState):
-    print("\n--- NODE: Generator (RAG) ---")
-    question = state["question"]
-    docs = state["documents"]
-    all_potential_sources = state.get("source_metadata", [])
-    
-    if not docs:
-        return {"final_answer": "I searched but could not find specific information. Please refine your query."}
-
-    context_str = "\n\n".join(docs)[:18000]
-    
-    prompt = f"""You are an expert Indian Tax Lawyer and Legal Drafter.
+def _rag_prompt(question: str, context_str: str) -> str:
+    return f"""You are an expert Indian Tax Lawyer and Legal Drafter.
     
     USER QUERY: {question}
     
@@ -280,8 +287,33 @@ def generate_rag_node(state: GraphState):
     - For Files: [Source: Filename]
     - For Cases: [Case: Case Name]
     """
+
+# --- NODE 3: RAG GENERATOR ---
+def generate_rag_node(state: GraphState):
+    print("\n--- NODE: Generator (RAG) ---")
+    question = state["question"]
+    docs = state["documents"]
+    all_potential_sources = state.get("source_metadata", [])
+    
+    if not docs:
+        return {"final_answer": "I searched but could not find specific information. Please refine your query."}
+
+    blocks = state.get("context_blocks") or []
+    if blocks:
+        # Pack whole blocks by relevance into the token budget left after the prompt + answer
+        context_packer = get_context_packer()
+        prompt_tokens = context_packer.counter.count(_rag_prompt(question, ""))
+        packed = context_packer.pack(blocks, prompt_tokens=prompt_tokens)
+        context_str = packed["context"]
+        print(f"   [Packer] Kept {packed['kept']}/{len(blocks)} blocks ({packed['used_tokens']}/{packed['budget_tokens']} tokens).")
+        for dropped in packed["dropped"]:
+            print(f"   [Packer] Dropped ({dropped['tokens']} tokens, score {dropped['score']:.2f}): {dropped['preview']}...")
+    else:
+        context_str = "\n\n".join(docs)[:18000]
+
+    prompt = _rag_prompt(question, context_str)
     
-    response = llm_gen.invoke([HumanMessage(content=prompt)])
+    response = get_llm_gen().invoke([HumanMessage(content=prompt)])
     final_answer = response.content
 
     filtered_sources = []
@@ -328,7 +360,7 @@ def generate_direct_node(state: GraphState):
     question = state["question"]
     summary = state.get("conversation_summary", "")
     prompt = f"You are an Indian Tax Law expert. Answer directly.\nQuery: {question}\nContext: {summary}"
-    response = llm_gen.invoke([HumanMessage(content=prompt)])
+    response = get_llm_gen().invoke([HumanMessage(content=prompt)])
     return {"final_answer": response.content}
 
 # --- NODE 5: METADATA ---
@@ -340,7 +372,7 @@ def metadata_node(state: GraphState):
     old_summary = state.get("conversation_summary", "")
     
     # We use the Router model because it is better at strict JSON instruction following
-    structured_llm = llm_router.with_structured_output(ChatMetadata)
+    structured_llm = get_llm_router().with_structured_output(ChatMetadata)
     
     system_prompt = """You are a background conversation processor. 
     Your job is to maintain the chat history and generate metadata.
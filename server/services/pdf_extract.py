@@ -0,0 +1,109 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, BinaryIO, Iterator, List, Tuple, Union
+
+def page_count(path: str) -> int:
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+
+def extract_page_range(path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Runs in a worker process: text of pages [start, end) as (page_number, text)."""
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    return [(i, reader.pages[i].extract_text() or "") for i in range(start, min(end, len(reader.pages)))]
+
+
+def page_document(text: str, source: str, page: int, total_pages: int):
+    from langchain_core.documents import Document
+    # Same metadata keys PyPDFLoader sets
+    return Document(page_content=text, metadata={"source": source, "page": page, "total_pages": total_pages})
+
+
+def iter_stream_pages(stream: BinaryIO, reader=None) -> Iterator[Tuple[int, int, str]]:
+    """(page_number, total_pages, text) straight from an in-memory PDF, in the calling thread."""
+    if reader is None:
+        from pypdf import PdfReader
+        reader = PdfReader(stream)
+    total = len(reader.pages)
+    for i, page in enumerate(reader.pages):
+        yield i, total, page.extract_text() or ""
+
+
+class PageExtractor:
+    """
+    PDF page text extraction on a process pool sized to the node's cores.
+
+    pypdf is pure Python and CPU-bound, so threads don't help. A large file is
+    split into page ranges that are extracted in parallel and yielded back in
+    page order; concurrent ingestion jobs share the pool, so several files are
+    parsed on several cores. Ranges are submitted a bounded window ahead of the
+    consumer, which keeps streaming ingestion's memory flat.
+    """
+
+    def __init__(self, max_workers: int = 0, pages_per_task: int = 16, min_pages_for_pool: int = 24):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task
+        self.min_pages_for_pool = min_pages_for_pool
+        # spawn: the parent holds model threads and client sockets that must not be forked
+        self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def iter_pages(self, path: Union[str, BinaryIO]) -> Iterator[Any]:
+        if not isinstance(path, str):
+            yield from self._iter_stream(path)
+            return
+
+        total = page_count(path)
+        if total < self.min_pages_for_pool or self.max_workers == 1:
+            for page, text in extract_page_range(path, 0, total):
+                yield page_document(text, path, page, total)
+            return
+        yield from self._iter_pool(path, total, path)
+
+    def _iter_stream(self, stream: BinaryIO) -> Iterator[Any]:
+        """
+        In-memory download. Short documents are parsed right here; long ones are
+        written to a private temp file for the pool, since worker processes can't
+        share the buffer (the write is cheap next to parsing hundreds of pages).
+        """
+        from pypdf import PdfReader
+        name = getattr(stream, "name", "")
+        stream.seek(0)
+        reader = PdfReader(stream)
+        total = len(reader.pages)
+        if total < self.min_pages_for_pool or self.max_workers == 1:
+            for page, _, text in iter_stream_pages(stream, reader):
+                yield page_document(text, name, page, total)
+            return
+
+        fd, spill_path = tempfile.mkstemp(prefix="ingest-", suffix=".pdf")
+        try:
+            with os.fdopen(fd, "wb") as spill:
+                stream.seek(0)
+                shutil.copyfileobj(stream, spill)
+            yield from self._iter_pool(spill_path, total, name)
+        finally:
+            os.remove(spill_path)
+
+    def _iter_pool(self, path: str, total: int, name: str) -> Iterator[Any]:
+        ranges = deque((start, start + self.pages_per_task) for start in range(0, total, self.pages_per_task))
+        in_flight = deque()
+        window = 2 * self.max_workers
+        try:
+            while ranges or in_flight:
+                while ranges and len(in_flight) < window:
+                    start, end = ranges.popleft()
+                    in_flight.append(self._pool.submit(extract_page_range, path, start, end))
+                # Oldest range first: results come back in page order
+                for page, text in in_flight.popleft().result():
+                    yield page_document(text, name, page, total)
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    def close(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
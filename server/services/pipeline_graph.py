@@ -46,5 +46,4 @@ def build_rag_graph():
 
     return workflow.compile()
 
-# Initialize global instance
-rag_app = build_rag_graph()
\ No newline at end of file
+# The compiled graph is built once per process by services.registry.get_rag_app()
\ No newline at end of file
@@ -6,7 +6,7 @@ from langchain_groq import ChatGroq
 from langchain_core.prompts import PromptTemplate
 
 from services.ragRetreiver import RAGRetriever
-from services.embedding import EmbeddingManager
+from services.registry import get_embedding_manager
 from vectorStore_AWS import VectorStore
 
 # FIXED — HumanMessage moved to langchain_core
@@ -21,7 +21,7 @@ load_env()
 groq_api_key = get_api_key()
 
 llm=ChatGroq(groq_api_key=groq_api_key,model_name="meta-llama/llama-4-maverick-17b-128e-instruct",temperature=0.1,max_tokens=4096)
-embedding_manager = EmbeddingManager()
+embedding_manager = get_embedding_manager()
 vectorstore = VectorStore()
 rag_retriever=RAGRetriever(vectorstore,embedding_manager)
 
@@ -1,62 +1,180 @@
 from services.embedding import EmbeddingManager
 from services.vectorStore import VectorStore
-from typing import List, Dict, Any
+from services.lexical_index import reciprocal_rank_fusion
+from services.section_index import extract_sections, case_sections
+from services.dedup import remove_near_duplicates, merge_file_chunks, merge_case_records
+from services.mmr import mmr_select
+from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+FILE_INDEX_NAME = "file-upload-index"
+CASE_INDEX_NAME = "s3-vector-index"
 
 class RAGRetriever:
     """Handles Dual-Path retrieval."""
 
-    def __init__(self, vector_store: VectorStore, embedding_manager: EmbeddingManager):
+    def __init__(self, vector_store: VectorStore, embedding_manager: EmbeddingManager, max_concurrency: int = 8, hybrid: bool = True, rrf_k: int = 60, compact: bool = True, mmr_k: Optional[int] = 10, mmr_lambda: float = 0.5, reranker=None):
         self.vector_store = vector_store
         self.embedding_manager = embedding_manager
+        # Cap on in-flight query_vectors calls per retrieve_split (1 = sequential)
+        self.max_concurrency = max(1, max_concurrency)
+        # Fuse BM25 rankings (exact tokens like "153A", "ITAT") with dense ones via RRF
+        self.hybrid = hybrid
+        self.rrf_k = rrf_k
+        # Drop exact/near-duplicate hits and merge chunks of one file/case into one block
+        self.compact = compact
+        # MMR keeps at most mmr_k hits per path (None disables); lower lambda = more diverse
+        self.mmr_k = mmr_k
+        self.mmr_lambda = mmr_lambda
+        # Cross-encoder top-N over individual chunks/cases (before merging), scored against `question`
+        self.reranker = reranker
+
+    @staticmethod
+    def _case_text(doc: Dict[str, Any]) -> str:
+        meta = doc.get("metadata", {})
+        return f"{meta.get('main_issue', '')}\n{meta.get('decision_reasoning', '')}".strip() or meta.get("case_about_detailed", "")
+
+    def _search(self, search, index_name: str, **kwargs) -> List[Dict[str, Any]]:
+        """One fan-out job: the search, plus the hits' stored vectors when MMR needs them."""
+        hits = search(**kwargs)
+        # Fetched here so the get_vectors round trips overlap with the other searches
+        return self.vector_store.with_vectors(hits, index_name) if self.mmr_k is not None else hits
+
+    def _mmr(self, query_vectors: np.ndarray, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Diversity re-ranking on the STORED vectors: local hits carry theirs, remote
+        ones got them in the fan-out (no re-embedding). If some hit still has no
+        vector, MMR is skipped for this path.
+        """
+        if self.mmr_k is None or len(docs) <= 1:
+            return docs
+
+        vectors = [doc.get("vector") for doc in docs]
+        if any(vec is None for vec in vectors):
+            print(f"   [RAGRetriever] {sum(vec is None for vec in vectors)} hits without stored vectors; skipping MMR.")
+            return docs
+
+        order = mmr_select(query_vectors, np.vstack(vectors), k=self.mmr_k, lambda_mult=self.mmr_lambda)
+        return [docs[i] for i in order]
+
+    def _rerank(self, question: str, docs: List[Dict[str, Any]], text_fn) -> List[Dict[str, Any]]:
+        if self.reranker is None or not question or len(docs) <= 1:
+            return docs
+        return self.reranker.rerank(question, docs, text_fn=text_fn)
+
+    def embed_queries(self, file_queries: List[str], case_queries: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Encodes every file and case query in ONE model call.
+        Returns {"files": (len(file_queries), dim), "cases": (len(case_queries), dim)}.
+        """
+        all_queries = list(file_queries) + list(case_queries)
+        if not all_queries:
+            return {"files": None, "cases": None}
+
+        # Identical queries (common across file/case lists) are only encoded once
+        unique_queries = list(dict.fromkeys(all_queries))
+        unique_embs = np.asarray(self.embedding_manager.generate_embeddings(unique_queries), dtype="float32")
+        row_of = {q: i for i, q in enumerate(unique_queries)}
 
-    def retrieve_split(self, file_queries: List[str], case_queries: List[str], thread_id: str, top_k: int = 10) -> Dict[str, List[Any]]:
+        file_embs = unique_embs[[row_of[q] for q in file_queries]] if file_queries else None
+        case_embs = unique_embs[[row_of[q] for q in case_queries]] if case_queries else None
+        return {"files": file_embs, "cases": case_embs}
+
+    def retrieve_split(self, file_queries: List[str], case_queries: List[str], thread_id: str, top_k: int = 10, question: str = "") -> Dict[str, List[Any]]:
+        query_embs = self.embed_queries(file_queries, case_queries)
+        return self.retrieve_split_with_vectors(
+            file_queries=file_queries,
+            file_vectors=query_embs["files"],
+            case_queries=case_queries,
+            case_vectors=query_embs["cases"],
+            thread_id=thread_id,
+            top_k=top_k,
+            question=question
+        )
+
+    def retrieve_split_with_vectors(
+        self,
+        file_queries: List[str],
+        file_vectors: Optional[np.ndarray],
+        case_queries: List[str],
+        case_vectors: Optional[np.ndarray],
+        thread_id: str,
+        top_k: int = 10,
+        question: str = ""
+    ) -> Dict[str, List[Any]]:
+        """
+        Same as retrieve_split, but takes pre-computed query matrices
+        (one row per query, in query order) so callers can reuse them.
+        """
         results = {"files": [], "cases": []}
-        
-        # --- 1. PROCESS FILES (Loop through ALL queries) ---
+        if not file_queries and not case_queries:
+            return results
+
+        # Statute sections named by the user or the router ("14A", "148") narrow the case search
+        sections = extract_sections(" ".join([question] + list(case_queries))) if case_queries else []
+        if sections:
+            print(f"   [RAGRetriever] Sections referenced: {sections}")
+
+        # --- 1. FAN OUT: one search per query, files and cases together ---
+        # boto3 clients are thread-safe, so every query_vectors call can be in flight
+        # at once; latency becomes ~ the slowest single search instead of the sum.
+        file_jobs = [np.asarray(v, dtype="float32").tolist() for v in file_vectors] if file_queries else []
+        case_jobs = [np.asarray(v, dtype="float32").tolist() for v in case_vectors] if case_queries else []
+        n_workers = min(self.max_concurrency, len(file_jobs) + len(case_jobs))
+        print(f"   [RAGRetriever] Executing {len(file_jobs)} File + {len(case_jobs)} Case Queries ({n_workers} workers)...")
+
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            file_futures = [
+                pool.submit(self._search, self.vector_store.search_private_files, FILE_INDEX_NAME, query_vector=v, user_id=thread_id, k=top_k)
+                for v in file_jobs
+            ]
+            case_futures = [
+                pool.submit(self._search, self.vector_store.search_public_cases, CASE_INDEX_NAME, query_vector=v, k=top_k, sections=sections)
+                for v in case_jobs
+            ]
+            # Collected in query order (not completion order) so the merge is deterministic
+            file_hits = [f.result() for f in file_futures]
+            case_hits = [f.result() for f in case_futures]
+
+        # --- 2. LEXICAL RANKINGS (local BM25; None when no corpus is available) ---
+        file_lexical, case_lexical = [], []
+        if self.hybrid:
+            file_lexical = [self.vector_store.lexical_search_private_files(q, user_id=thread_id, k=top_k) for q in file_queries]
+            case_lexical = [self.vector_store.lexical_search_public_cases(q, k=top_k) for q in case_queries]
+
+        # --- 3. FUSE + DEDUPLICATE FILES ---
         if file_queries:
-            print(f"   [RAGRetriever] Executing {len(file_queries)} File Queries...")
-            unique_files = {} # Dict for deduplication
-            
-            for q in file_queries:
-                # Embed and Search for EACH query
-                q_emb = self.embedding_manager.generate_embeddings([q])[0]
-                
-                raw_files = self.vector_store.search_private_files(
-                    query_vector=q_emb.astype("float32").tolist(), 
-                    user_id=thread_id,
-                    k=top_k
-                )
-                
-                # Deduplicate by text content or filename
-                for doc in raw_files:
-                    # Use a unique key (filename + chunk index if available, or just text hash)
-                    doc_key = doc.get("metadata", {}).get("text", "")[:50] 
-                    if doc_key and doc_key not in unique_files:
-                        unique_files[doc_key] = doc
-            
-            results["files"] = list(unique_files.values())
-            print(f"   [RAGRetriever] Found {len(results['files'])} unique file chunks.")
-
-        # --- 2. PROCESS CASES (Loop through ALL queries) ---
+            rankings = file_hits + [r for r in file_lexical if r]
+            # RRF sums the ranks of every list a chunk appears in
+            fused = reciprocal_rank_fusion(
+                rankings, key_fn=lambda doc: doc.get("key") or doc.get("metadata", {}).get("text", "")[:50], rrf_k=self.rrf_k
+            )
+            file_text = lambda doc: doc.get("metadata", {}).get("text", "")
+            unique = remove_near_duplicates(fused, text_fn=file_text) if self.compact else fused
+            unique = self._mmr(np.asarray(file_vectors), unique)
+            unique = self._rerank(question, unique, file_text)
+            results["files"] = merge_file_chunks(unique) if self.compact else unique
+            print(f"   [RAGRetriever] {len(fused)} file chunks ({len(rankings)} rankings fused) -> {len(unique)} after dedup/MMR/rerank -> {len(results['files'])} blocks.")
+
+        # --- 4. FUSE + DEDUPLICATE CASES ---
         if case_queries:
-            print(f"   [RAGRetriever] Executing {len(case_queries)} Case Queries...")
-            unique_cases = {}
-            
-            for q in case_queries:
-                q_emb = self.embedding_manager.generate_embeddings([q])[0]
-                
-                raw_cases = self.vector_store.search_public_cases(
-                    query_vector=q_emb.astype("float32").tolist(), 
-                    k=top_k
-                )
-                
-                for doc in raw_cases:
-                    # Deduplicate cases
-                    doc_key = doc.get("metadata", {}).get("case_about_detailed", "")[:50]
-                    if doc_key and doc_key not in unique_cases:
-                        unique_cases[doc_key] = doc
-
-            results["cases"] = list(unique_cases.values())
-            print(f"   [RAGRetriever] Found {len(results['cases'])} unique cases.")
-            
-        return results
\ No newline at end of file
+            rankings = case_hits + [r for r in case_lexical if r]
+            if sections:
+                # Boost: cases citing a referenced section form one more ranking for RRF
+                wanted, boosted = set(sections), {}
+                for ranking in case_hits:
+                    for doc in ranking:
+                        if case_sections(doc.get("metadata", {})) & wanted:
+                            boosted.setdefault(doc.get("key") or id(doc), doc)
+                rankings.append(list(boosted.values()))
+            fused = reciprocal_rank_fusion(
+                rankings, key_fn=lambda doc: doc.get("key") or doc.get("metadata", {}).get("case_about_detailed", "")[:50], rrf_k=self.rrf_k
+            )
+            unique = remove_near_duplicates(fused, text_fn=self._case_text) if self.compact else fused
+            unique = self._mmr(np.asarray(case_vectors), unique)
+            unique = self._rerank(question, unique, self._case_text)
+            results["cases"] = merge_case_records(unique) if self.compact else unique
+            print(f"   [RAGRetriever] {len(fused)} case hits ({len(rankings)} rankings fused) -> {len(unique)} after dedup/MMR/rerank -> {len(results['cases'])} cases.")
+
+        return results
@@ -0,0 +1,267 @@
+"""
+Process-wide registry of heavy, shareable objects (models, clients, indexes).
+
+Every module pulls its instances from here instead of constructing its own at
+import time, so a worker loads the SentenceTransformer (and opens each client)
+exactly once. Instances are created lazily on first use; `startup()` warms the
+core ones and `shutdown()` releases them (wired to FastAPI's lifespan in main.py).
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import configuration as config
+
+# RLock: factories call other getters (the retriever needs the embedding manager)
+_lock = threading.RLock()
+_instances: Dict[str, Any] = {}
+# Seconds each instance took to build; reported by services.startup_profile
+init_times: Dict[str, float] = {}
+
+
+def _get(name: str, factory: Callable[[], Any]) -> Any:
+    instance = _instances.get(name)
+    if instance is None:
+        with _lock:
+            instance = _instances.get(name)
+            if instance is None:
+                print(f"[Registry] Initializing {name}...")
+                start = time.perf_counter()
+                instance = factory()
+                init_times[name] = time.perf_counter() - start
+                _instances[name] = instance
+                print(f"[Registry] {name} ready in {init_times[name]:.2f}s")
+    return instance
+
+
+# --- CLIENTS ---
+
+def get_redis():
+    import redis
+    return _get("redis", lambda: redis.Redis(host='localhost', port=6379, db=0, decode_responses=True))
+
+
+def get_redis_binary():
+    """Same Redis, without response decoding, for values stored as raw bytes (vectors)."""
+    import redis
+    return _get("redis_binary", lambda: redis.Redis(host='localhost', port=6379, db=0, decode_responses=False))
+
+
+def get_s3_client(region_name: Optional[str] = None):
+    import boto3
+    return _get(f"s3:{region_name or 'default'}", lambda: boto3.client("s3", region_name=region_name) if region_name else boto3.client("s3"))
+
+
+def get_llm_router():
+    from langchain_groq import ChatGroq
+    return _get("llm_router", lambda: ChatGroq(api_key=config.get_api_key(), model="openai/gpt-oss-120b", temperature=0))
+
+
+def get_llm_gen():
+    from langchain_groq import ChatGroq
+    return _get("llm_gen", lambda: ChatGroq(
+        api_key=config.get_api_key(), model="openai/gpt-oss-120b", temperature=0.1, max_tokens=config.ANSWER_MAX_TOKENS
+    ))
+
+
+# --- RAG COMPONENTS ---
+
+def get_embedding_manager():
+    def factory():
+        from services.embedding import EmbeddingManager
+        from services.embedding_cache import QueryEmbeddingCache
+        return EmbeddingManager(
+            cache=QueryEmbeddingCache(),
+            backend=config.EMBEDDING_BACKEND,
+            intra_op_threads=config.EMBEDDING_THREADS,
+            quantization_config=config.EMBEDDING_QUANTIZATION
+        )
+    return _get("embedding_manager", factory)
+
+
+def get_query_embedder():
+    """
+    Embedder for per-request queries: a BatchingEmbedder that coalesces concurrent
+    turns into one forward pass, or the plain manager when batching is disabled.
+    """
+    if config.EMBEDDING_BATCH_WAIT_MS <= 0:
+        return get_embedding_manager()
+
+    def factory():
+        from services.embedding_batcher import BatchingEmbedder
+        return BatchingEmbedder(get_embedding_manager(), max_batch_size=config.EMBEDDING_MAX_BATCH, max_wait_ms=config.EMBEDDING_BATCH_WAIT_MS)
+    return _get("query_embedder", factory)
+
+
+def get_thread_index():
+    def factory():
+        from services.thread_index import ThreadIndexStore, DEFAULT_THREAD_INDEX_DIR
+        from services.ingest_pipeline import manifest_files
+        # The Redis manifest lists every file of the thread, whichever node ingested it
+        return ThreadIndexStore(
+            config.THREAD_INDEX_DIR or DEFAULT_THREAD_INDEX_DIR, dtype=config.THREAD_INDEX_DTYPE, expected_files=manifest_files
+        )
+    return _get("thread_index", factory)
+
+
+def get_vector_store():
+    def factory():
+        if config.CASE_INDEX_BACKEND == "local":
+            from services.vectorStore_local import LocalVectorStore, DEFAULT_INDEX_DIR
+            return LocalVectorStore(index_dir=config.CASE_INDEX_DIR or DEFAULT_INDEX_DIR, thread_index=get_thread_index())
+        from services.vectorStore import VectorStore
+        from services.result_cache import SemanticResultCache, CASE_INDEX_VERSION_KEY
+        # Every worker polls the shared version key, so one bump after a bulk load clears them all
+        case_cache = SemanticResultCache(
+            similarity_threshold=config.CASE_CACHE_SIMILARITY,
+            version_source=lambda: get_redis().get(CASE_INDEX_VERSION_KEY)
+        )
+        return VectorStore(case_cache=case_cache, thread_index=get_thread_index())
+    return _get("vector_store", factory)
+
+
+def get_rag_retriever():
+    def factory():
+        from services.ragRetreiver import RAGRetriever
+        return RAGRetriever(get_vector_store(), get_query_embedder(), reranker=get_reranker())
+    return _get("rag_retriever", factory)
+
+
+_RERANKER_DISABLED = object()
+
+def get_reranker():
+    """The cross-encoder reranker, or None when disabled/unavailable."""
+    def factory():
+        if not config.RERANKER_ENABLED:
+            return _RERANKER_DISABLED
+        from services.reranker import CrossEncoderReranker, DEFAULT_RERANKER_MODEL
+        try:
+            return CrossEncoderReranker(config.RERANKER_MODEL or DEFAULT_RERANKER_MODEL, batch_size=config.RERANKER_BATCH_SIZE, top_n=config.RERANKER_TOP_N)
+        except Exception as e:
+            print(f"[Reranker] Disabled (model unavailable locally): {e}")
+            return _RERANKER_DISABLED
+    reranker = _get("reranker", factory)
+    return None if reranker is _RERANKER_DISABLED else reranker
+
+
+def get_context_packer():
+    def factory():
+        from services.context_packer import ContextPacker, TokenCounter, DEFAULT_TIKTOKEN_DIR
+        return ContextPacker(
+            counter=TokenCounter(cache_dir=config.TIKTOKEN_CACHE_DIR or DEFAULT_TIKTOKEN_DIR),
+            context_budget=config.CONTEXT_TOKEN_BUDGET,
+            model_context_window=config.MODEL_CONTEXT_WINDOW,
+            answer_tokens=config.ANSWER_MAX_TOKENS
+        )
+    return _get("context_packer", factory)
+
+
+def get_vector_uploader():
+    def factory():
+        from services.vector_uploader import VectorUploader
+        vector_store = get_vector_store()
+        return VectorUploader(
+            vector_store.s3vectors, vector_store.bucket_name,
+            max_vectors_per_request=config.UPLOAD_MAX_VECTORS,
+            max_request_bytes=config.UPLOAD_MAX_BYTES,
+            max_workers=config.UPLOAD_CONCURRENCY
+        )
+    return _get("vector_uploader", factory)
+
+
+def get_chunk_cache():
+    def factory():
+        from services.chunk_cache import ChunkEmbeddingCache
+        manager = get_embedding_manager()
+        dim = manager.model.get_sentence_embedding_dimension() if manager.model is not None else 384
+        return ChunkEmbeddingCache(
+            get_redis_binary(), f"{manager.model_name}:{manager.backend}",
+            max_bytes=config.CHUNK_CACHE_MAX_MB * 1024 * 1024, dim=dim or 384
+        )
+    return _get("chunk_cache", factory)
+
+
+def get_page_extractor():
+    def factory():
+        from services.pdf_extract import PageExtractor
+        return PageExtractor(
+            max_workers=config.PDF_WORKERS, pages_per_task=config.PDF_PAGES_PER_TASK, min_pages_for_pool=config.PDF_MIN_PAGES_FOR_POOL
+        )
+    return _get("page_extractor", factory)
+
+
+def ingest_concurrency() -> int:
+    """Jobs per ingestion worker process: INGEST_CONCURRENCY, else one per PDF pool process."""
+    if config.INGEST_CONCURRENCY > 0:
+        return config.INGEST_CONCURRENCY
+    return config.PDF_WORKERS if config.PDF_WORKERS > 0 else (os.cpu_count() or 1)
+
+
+def get_document_registry():
+    def factory():
+        from services.document_registry import DocumentRegistry
+        return DocumentRegistry(get_redis(), get_vector_store(), get_vector_uploader())
+    return _get("document_registry", factory)
+
+
+def get_ingest_pipeline():
+    def factory():
+        from services.ingest_pipeline import IngestionPipeline
+        return IngestionPipeline(
+            get_embedding_manager(), get_vector_store(), get_vector_uploader(),
+            embed_batch_size=config.INGEST_EMBED_BATCH, upload_window=config.INGEST_UPLOAD_WINDOW,
+            documents=get_document_registry() if config.INGEST_DEDUP else None,
+            chunk_cache=get_chunk_cache() if config.CHUNK_CACHE_MAX_MB > 0 else None,
+            page_extractor=get_page_extractor() if config.PDF_WORKERS >= 0 else None
+        )
+    return _get("ingest_pipeline", factory)
+
+
+def get_ingest_queue():
+    def factory():
+        from services.ingest_queue import IngestionQueue
+        return IngestionQueue(get_redis(), max_attempts=config.INGEST_MAX_ATTEMPTS)
+    return _get("ingest_queue", factory)
+
+
+def get_rag_app():
+    """The compiled LangGraph pipeline (imports langgraph, langchain and the nodes on first use)."""
+    def factory():
+        from services.pipeline_graph import build_rag_graph
+        return build_rag_graph()
+    return _get("rag_app", factory)
+
+
+# --- LIFECYCLE ---
+
+def startup():
+    """
+    Warm the instances every request needs, so the first user turn doesn't pay for them.
+    With WARM_ON_STARTUP=false the worker serves immediately and each piece loads on first use.
+    """
+    if not config.WARM_ON_STARTUP:
+        print("[Registry] Skipping warm-up (WARM_ON_STARTUP=false); instances load on first use.")
+        return
+    get_embedding_manager()
+    get_query_embedder()
+    get_vector_store()
+    get_rag_retriever()
+    # Loads the tokenizer file once here instead of on the first turn
+    get_context_packer()
+    get_rag_app()
+    get_redis()
+
+
+def shutdown():
+    with _lock:
+        for name, instance in list(_instances.items()):
+            close = getattr(instance, "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception as e:
+                    print(f"[Registry] Error closing {name}: {e}")
+        _instances.clear()
+        init_times.clear()
+    print("[Registry] All shared instances released.")
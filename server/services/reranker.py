@@ -0,0 +1,94 @@
+import argparse
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+
+DEFAULT_RERANKER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+class CrossEncoderReranker:
+    """
+    Scores (question, candidate) pairs with a small cross-encoder on CPU and keeps the top-N.
+    The model is loaded from a local path or the local HF cache only (no network).
+    Per-batch timings are kept in `batch_timings` for sizing batch_size on a node.
+    """
+
+    def __init__(self, model_name_or_path: str = DEFAULT_RERANKER_MODEL, batch_size: int = 16, top_n: int = 6, max_length: int = 512):
+        self.model_name = model_name_or_path
+        self.batch_size = batch_size
+        self.top_n = top_n
+        self.max_length = max_length
+        self.batch_timings: deque = deque(maxlen=256)
+        self._lock = threading.Lock()
+        self.model = None
+        self._load_model()
+
+    def _load_model(self):
+        from sentence_transformers import CrossEncoder
+        try:
+            print(f"[Reranker] Loading cross-encoder: {self.model_name}")
+            self.model = CrossEncoder(self.model_name, max_length=self.max_length, device="cpu", local_files_only=True)
+            print("[Reranker] Model loaded successfully.")
+        except Exception as e:
+            print(f"[Reranker] Error loading model: {e}")
+            raise
+
+    def score(self, question: str, texts: List[str]) -> np.ndarray:
+        scores = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = [(question, t) for t in texts[start:start + self.batch_size]]
+            t0 = time.perf_counter()
+            batch_scores = self.model.predict(batch, batch_size=len(batch), show_progress_bar=False)
+            elapsed = time.perf_counter() - t0
+            timing = {"batch_size": len(batch), "seconds": elapsed, "pairs_per_sec": len(batch) / elapsed if elapsed else 0.0}
+            with self._lock:
+                self.batch_timings.append(timing)
+            print(f"   [Reranker] Batch of {len(batch)} scored in {elapsed * 1000:.1f} ms")
+            scores.append(np.asarray(batch_scores, dtype="float32"))
+        return np.concatenate(scores) if scores else np.zeros(0, dtype="float32")
+
+    def rerank(self, question: str, docs: List[Dict[str, Any]], text_fn: Callable[[Dict[str, Any]], str], top_n: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Returns the top_n docs (copies carrying "rerank_score"), best first."""
+        top_n = top_n or self.top_n
+        if len(docs) <= 1:
+            return docs
+        scores = self.score(question, [text_fn(d) for d in docs])
+        order = np.argsort(-scores, kind="stable")[:top_n]
+        print(f"   [Reranker] Kept {len(order)}/{len(docs)} candidates.")
+        return [{**docs[i], "rerank_score": float(scores[i])} for i in order]
+
+    def timing_stats(self) -> Dict[str, float]:
+        with self._lock:
+            timings = list(self.batch_timings)
+        if not timings:
+            return {"batches": 0}
+        seconds = [t["seconds"] for t in timings]
+        return {
+            "batches": len(timings),
+            "mean_batch_ms": 1000 * float(np.mean(seconds)),
+            "p95_batch_ms": 1000 * float(np.percentile(seconds, 95)),
+            "pairs_per_sec": sum(t["batch_size"] for t in timings) / sum(seconds)
+        }
+
+
+if __name__ == "__main__":
+    # Batch-size sweep on this node: python -m services.reranker --batch-sizes 4 8 16 32
+    parser = argparse.ArgumentParser(description="Cross-encoder batch size benchmark")
+    parser.add_argument("--model", default=DEFAULT_RERANKER_MODEL)
+    parser.add_argument("--pairs", type=int, default=64)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[4, 8, 16, 32])
+    args = parser.parse_args()
+
+    question = "Whether reassessment notice under Section 148 issued after four years is valid"
+    passage = "The Tribunal held that the reopening of assessment under Section 147 was bad in law as there was no failure on the part of the assessee to disclose fully and truly all material facts. " * 3
+    texts = [passage] * args.pairs
+
+    reranker = CrossEncoderReranker(args.model)
+    reranker.score(question, texts[:reranker.batch_size])  # warm-up
+    for batch_size in args.batch_sizes:
+        reranker.batch_size = batch_size
+        reranker.batch_timings.clear()
+        reranker.score(question, texts)
+        stats = reranker.timing_stats()
+        print(f"[Benchmark] batch_size={batch_size:<3} mean={stats['mean_batch_ms']:.1f} ms  p95={stats['p95_batch_ms']:.1f} ms  {stats['pairs_per_sec']:.1f} pairs/s")
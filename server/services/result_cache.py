@@ -0,0 +1,157 @@
+import argparse
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+# Redis key holding the s3-vector-index version; bumped by whatever bulk-loads judgments
+CASE_INDEX_VERSION_KEY = "case_index_version"
+
+def publish_case_index_version(redis_client, version: Optional[str] = None) -> str:
+    """Marks s3-vector-index as reloaded; every worker's cache drops its entries on its next check."""
+    version = version or str(time.time())
+    redis_client.set(CASE_INDEX_VERSION_KEY, version)
+    print(f"[ResultCache] Published case index version {version}")
+    return version
+
+
+class SemanticResultCache:
+    """
+    Caches public-case search results keyed on the query VECTOR and the statute
+    sections the query references. A lookup is a hit when a cached query has
+    cosine similarity >= similarity_threshold, the same section set, and was
+    searched with at least the requested top-k. The section match matters:
+    MiniLM puts "Section 147 notice..." and "Section 148 notice..." above any
+    useful threshold, so similarity alone would serve one section's precedents
+    for the other.
+
+    Entries are LRU-evicted and tagged with the index version; bump_version()
+    (or a change reported by version_source) drops everything after a bulk load
+    of new judgments.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 2048,
+        similarity_threshold: float = 0.97,
+        version_source: Optional[Callable[[], Optional[str]]] = None,
+        version_check_interval: float = 30.0
+    ):
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        # e.g. lambda: redis_client.get("case_index_version") so every worker sees a reload
+        self.version_source = version_source
+        self.version_check_interval = version_check_interval
+
+        self.version = None
+        self._last_version_check = 0.0
+
+        # Unit-normalized query vectors live in a fixed matrix; one row ("slot") per entry
+        self._matrix: Optional[np.ndarray] = None
+        self._free_slots: List[int] = []
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _unit(vector: List[float]) -> np.ndarray:
+        vec = np.asarray(vector, dtype="float32")
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    def _sync_version(self):
+        if self.version_source is None:
+            return
+        now = time.monotonic()
+        if now - self._last_version_check < self.version_check_interval:
+            return
+        self._last_version_check = now
+        try:
+            current = self.version_source()
+        except Exception as e:
+            print(f"[ResultCache] Version check failed: {e}")
+            return
+        if current != self.version:
+            print(f"[ResultCache] Index version changed ({self.version} -> {current}). Invalidating.")
+            self._reset(current)
+
+    @staticmethod
+    def _section_key(sections: Optional[Sequence[str]]) -> Tuple[str, ...]:
+        return tuple(sorted(set(sections or [])))
+
+    def get(self, query_vector: List[float], k: int, sections: Optional[Sequence[str]] = None) -> Optional[List[Dict[str, Any]]]:
+        query = self._unit(query_vector)
+        section_key = self._section_key(sections)
+        with self._lock:
+            self._sync_version()
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            slots = list(self._entries.keys())
+            sims = self._matrix[slots] @ query
+            # Best match first; fall through if it was searched with a smaller top-k
+            for idx in np.argsort(-sims):
+                if sims[idx] < self.similarity_threshold:
+                    break
+                slot = slots[idx]
+                entry = self._entries[slot]
+                if entry["k"] >= k and entry["sections"] == section_key:
+                    self._entries.move_to_end(slot)
+                    self.hits += 1
+                    return entry["results"][:k]
+
+            self.misses += 1
+            return None
+
+    def put(self, query_vector: List[float], k: int, results: List[Dict[str, Any]], sections: Optional[Sequence[str]] = None):
+        query = self._unit(query_vector)
+        with self._lock:
+            self._sync_version()
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, query.shape[0]), dtype="float32")
+                self._free_slots = list(range(self.max_entries - 1, -1, -1))
+
+            if not self._free_slots:
+                evicted, _ = self._entries.popitem(last=False)
+                self._free_slots.append(evicted)
+
+            slot = self._free_slots.pop()
+            self._matrix[slot] = query
+            self._entries[slot] = {"k": k, "sections": self._section_key(sections), "results": results}
+
+    def bump_version(self, version: Optional[str] = None):
+        """Call after the case index is (re)loaded."""
+        with self._lock:
+            self._reset(version if version is not None else str(time.time()))
+
+    def _reset(self, version: Optional[str]):
+        self.version = version
+        self._entries.clear()
+        self._free_slots = list(range(self.max_entries - 1, -1, -1)) if self._matrix is not None else []
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0
+            }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Case result cache tooling")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_bump = sub.add_parser("bump", help="Run after bulk-loading judgments into s3-vector-index")
+    p_bump.add_argument("--version", default=None, help="Version label (default: current timestamp)")
+
+    args = parser.parse_args()
+    if args.command == "bump":
+        from services.registry import get_redis
+        publish_case_index_version(get_redis(), args.version)
@@ -0,0 +1,75 @@
+import io
+import os
+import tempfile
+import time
+from typing import BinaryIO, Optional, Union
+
+class SpooledDownload:
+    """
+    Write target for an S3 download that stays in memory up to `max_memory`
+    bytes and spills to a private temp file (mkstemp: unique name, mode 0600)
+    above it. Nothing is ever written under the working directory, so
+    concurrent jobs for same-named files cannot collide.
+
+    `source` is what the parser reads: the in-memory stream for small files,
+    the spill file's path for large ones (worker processes can open a path).
+    Always close() it (or use it as a context manager); that removes the spill.
+    """
+
+    def __init__(self, name: str, max_memory: int = 32 * 1024 * 1024):
+        self.name = name
+        self.max_memory = max_memory
+        self.size = 0
+        self.path: Optional[str] = None
+        self._buffer: BinaryIO = io.BytesIO()
+
+    def seekable(self) -> bool:
+        # Makes s3transfer hand parts over in order instead of seeking around the buffer
+        return False
+
+    def write(self, data: bytes) -> int:
+        if self.path is None and self.size + len(data) > self.max_memory:
+            self._spill()
+        self._buffer.write(data)
+        self.size += len(data)
+        return len(data)
+
+    def _spill(self):
+        fd, self.path = tempfile.mkstemp(prefix="ingest-", suffix=os.path.splitext(self.name)[1] or ".pdf")
+        spill = os.fdopen(fd, "w+b")
+        spill.write(self._buffer.getbuffer())
+        self._buffer = spill
+        print(f">>> [S3] {self.name} exceeds {self.max_memory // (1024 * 1024)} MB; spilling to {self.path}")
+
+    @property
+    def source(self) -> Union[str, BinaryIO]:
+        self._buffer.flush()
+        if self.path is not None:
+            return self.path
+        self._buffer.seek(0)
+        return self._buffer
+
+    def close(self):
+        self._buffer.close()
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def download_to_spool(s3_client, bucket: str, key: str, max_memory: int) -> SpooledDownload:
+    """Streams s3://bucket/key into a SpooledDownload; the partial buffer is discarded on failure."""
+    spool = SpooledDownload(os.path.basename(key), max_memory=max_memory)
+    start = time.perf_counter()
+    try:
+        s3_client.download_fileobj(bucket, key, spool)
+    except Exception:
+        spool.close()
+        raise
+    where = "memory" if spool.path is None else "temp file"
+    print(f">>> [S3] Downloaded {spool.size / 1024:.0f} KB into {where} in {1000 * (time.perf_counter() - start):.0f} ms")
+    return spool
@@ -0,0 +1,127 @@
+import os
+import re
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Set
+import numpy as np
+
+# One section: 1-3 digits (the Act's numbering range, so years and counts like
+# "2020" never match), an optional letter suffix with or without a hyphen
+# ("14A", "80-IA", "80HHC") and optional sub-clauses ("10(23C)")
+_SECTION = r"\d{1,3}(?![0-9])(?:-?[a-z]{1,4})?(?![a-z0-9])(?:\([0-9a-z]+\))*"
+# A listed section after "and"/"or"/"to"/",": a letter suffix, or 2-3 digits followed by a
+# sub-clause, punctuation, the end, or a word that continues a citation, so "Section 148
+# and 2 others" or "section 147 and 25 notices" stop at the first number
+_FOLLOWER = r"(?:\s*(?:[,.;:)/&]|$)|\s+(?:of|and|or|to|read|r\.?w\.?s?|r/w|in|for|with|on|is|are|was|were|has|have|had|apply|applies|applied)\b)"
+_LISTED_SECTION = (
+    r"(?:\d{1,3}(?![0-9])-?[a-z]{1,4}(?![a-z0-9])(?:\([0-9a-z]+\))*"
+    rf"|\d{{2,3}}(?![0-9a-z])(?:\([0-9a-z]+\))*(?={_FOLLOWER}))"
+)
+_SEPARATOR = r"\s*(,|\band\b|&|/|\bor\b|\bto\b)\s*"
+# "Sections 147 to 151": plain-number ranges up to this span are expanded; wider ones are dropped
+MAX_SECTION_RANGE = 20
+
+# "Section 14A", "u/s 148", "r.w.s. 147", "s. 153A", "Sections 147 and 148", "sec. 10(23C)", "section 80-IA".
+# A bare "s." must stand alone (not the end of "Assessee's.") and be followed by a number.
+SECTION_REF_PATTERN = re.compile(
+    r"(?:\bsections?|\bsecs?\.?|\bu/s\.?|\br\.?w\.?s\.?|(?<![\w'’])s\.(?=\s*\d))\s*"
+    rf"({_SECTION}(?:\s*(?:,|and|&|/|or|to)\s*{_LISTED_SECTION})*)",
+    re.IGNORECASE
+)
+SECTION_NUMBER_PATTERN = re.compile(r"(?<![0-9a-z])\d{1,3}(?:-?[a-z]{1,4})?(?![0-9a-z])", re.IGNORECASE)
+_SUB_CLAUSE = re.compile(r"\([0-9a-z]+\)", re.IGNORECASE)
+
+
+def normalize_section(section: str) -> str:
+    # "80-IA" and "80IA" are the same section
+    return section.strip().replace("-", "").upper()
+
+
+def _section_range(start: str, end: str) -> List[str]:
+    """"147" to "151" -> 147..151; letter suffixes, reversed or overlong spans give nothing."""
+    if not (start.isdigit() and end.isdigit()) or not 0 < int(end) - int(start) <= MAX_SECTION_RANGE:
+        return []
+    return [str(n) for n in range(int(start), int(end) + 1)]
+
+
+def extract_sections(text: str) -> List[str]:
+    """Section numbers referenced in free text, in first-seen order ("14", "14A", "148")."""
+    found = []
+    for match in SECTION_REF_PATTERN.finditer(text or ""):
+        # Drop sub-clauses like "(23C)" before splitting the list into bare section numbers
+        parts = re.split(_SEPARATOR, _SUB_CLAUSE.sub("", match.group(1)), flags=re.IGNORECASE)
+        numbers, separators = [normalize_section(p) for p in parts[0::2]], [p.lower() for p in parts[1::2]]
+        i = 0
+        while i < len(numbers):
+            if i < len(separators) and separators[i] == "to":
+                found.extend(_section_range(numbers[i], numbers[i + 1]))
+                i += 2
+            else:
+                found.append(numbers[i])
+                i += 1
+    return list(dict.fromkeys(n for n in found if n))
+
+
+def case_sections(metadata: Dict[str, Any]) -> Set[str]:
+    """
+    Sections a case cites: the SECTIONS_CITED metadata field when present
+    (list or "14, 14A, 147" string), else references found in the issue/reasoning text.
+    """
+    cited = metadata.get("sections_cited")
+    if cited:
+        values = cited if isinstance(cited, list) else [cited]
+        return {normalize_section(n) for v in values for n in SECTION_NUMBER_PATTERN.findall(_SUB_CLAUSE.sub(" ", str(v)))}
+    text = f"{metadata.get('main_issue', '')} {metadata.get('decision_reasoning', '')}"
+    return set(extract_sections(text))
+
+
+class SectionIndex:
+    """
+    Inverted index: statute section -> row ids of the cases citing it.
+    Stored CSR-style (sorted section names, [start, end) pointers, flat row ids)
+    so save()/load() can memory-map it alongside the case vectors.
+    """
+
+    FILES = ("names", "ptr", "rows")
+
+    def __init__(self, names: np.ndarray, ptr: np.ndarray, rows: np.ndarray):
+        self.names = names
+        self.ptr = ptr
+        self.rows = rows
+
+    @classmethod
+    def from_metadata(cls, metadatas: Iterable[Dict[str, Any]]) -> "SectionIndex":
+        postings = defaultdict(list)
+        for row, metadata in enumerate(metadatas):
+            for section in case_sections(metadata):
+                postings[section].append(row)
+        names = sorted(postings)
+        ptr = np.zeros(len(names) + 1, dtype="int64")
+        ptr[1:] = np.cumsum([len(postings[n]) for n in names])
+        rows = np.asarray([r for n in names for r in postings[n]], dtype="int64")
+        return cls(np.asarray(names, dtype="U16"), ptr, rows)
+
+    def save(self, directory: str, prefix: str = "sections_"):
+        for name in self.FILES:
+            np.save(os.path.join(directory, f"{prefix}{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def exists(cls, directory: str, prefix: str = "sections_") -> bool:
+        return all(os.path.exists(os.path.join(directory, f"{prefix}{name}.npy")) for name in cls.FILES)
+
+    @classmethod
+    def load(cls, directory: str, prefix: str = "sections_") -> "SectionIndex":
+        return cls(*(np.load(os.path.join(directory, f"{prefix}{name}.npy"), mmap_mode="r") for name in cls.FILES))
+
+    def candidates(self, sections: List[str]) -> np.ndarray:
+        """Sorted union of rows citing any of the sections (empty if none match)."""
+        postings = []
+        for section in map(normalize_section, sections):
+            i = int(np.searchsorted(self.names, section))
+            if i < len(self.names) and self.names[i] == section:
+                postings.append(self.rows[self.ptr[i]:self.ptr[i + 1]])
+        if not postings:
+            return np.zeros(0, dtype="int64")
+        return np.unique(np.concatenate(postings))
+
+    def __len__(self):
+        return len(self.names)
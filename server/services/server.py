@@ -1,35 +1,34 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
+import asyncio
 from typing import Optional
 import os
 import glob
 import uuid
 import uvicorn
-import redis
 import requests
 import tempfile
-
-# LangChain Imports
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from contextlib import asynccontextmanager
 
 # Pipeline Imports
-from services.pipeline_graph import rag_app
-from services.embedding import EmbeddingManager
-from services.vectorStore import VectorStore
+from services import registry
+from services.registry import get_redis, get_s3_client, get_rag_app, get_ingest_pipeline
 
 from api.message import get_presigned_url
-import boto3
 from botocore.exceptions import ClientError
 from urllib.parse import unquote
+from configuration import DOWNLOAD_SPOOL_MAX_MB
+from services.s3_download import SpooledDownload, download_to_spool
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    registry.startup()
+    yield
+    registry.shutdown()
 
-app = FastAPI(title="Legal RAG API with Redis State Management")
+app = FastAPI(title="Legal RAG API with Redis State Management", lifespan=lifespan)
 
-# Initialize Globals
-embedding_manager = EmbeddingManager()
-vector_store = VectorStore()
-redis_client = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
-s3_client = boto3.client('s3')
+# Shared instances (embedding model, vector store, Redis, S3) come from services.registry
 
 # --- 1. REDIS STATE MANAGER ---
 class RedisStateManager:
@@ -38,7 +37,7 @@ class RedisStateManager:
         self.key = f"rag_session:{thread_id}"
 
     def get_state(self):
-        data = redis_client.hgetall(self.key)
+        data = get_redis().hgetall(self.key)
         return {
             "conversation_summary": data.get("conversation_summary", ""),
             "file_manifest": data.get("file_manifest", ""),
@@ -47,7 +46,7 @@ class RedisStateManager:
 
     def update_manifest(self, new_manifest: str, file_path: str):
         # Append new manifest to keep history of all uploaded files in session
-        current_manifest = redis_client.hget(self.key, "file_manifest") or ""
+        current_manifest = get_redis().hget(self.key, "file_manifest") or ""
 
         try:
             filename_line = new_manifest.split('\n')[0] 
@@ -62,13 +61,13 @@ class RedisStateManager:
         # prevent duplicate manifest entries if possible, otherwise just append
         updated_manifest = current_manifest + "\n\n" + new_manifest
         
-        redis_client.hset(self.key, mapping={
+        get_redis().hset(self.key, mapping={
             "file_manifest": updated_manifest.strip(),
             "file_path": file_path
         })
 
     def update_summary(self, new_summary: str):
-        redis_client.hset(self.key, "conversation_summary", new_summary)
+        get_redis().hset(self.key, "conversation_summary", new_summary)
 
 # --- 2. DATA MODELS ---
 class IngestRequest(BaseModel):
@@ -80,46 +79,27 @@ class QueryRequest(BaseModel):
     question: str
     ingest_files: bool = False
 
-def download_file_from_s3(filename: str) -> str:
+def download_file_from_s3(filename: str) -> SpooledDownload:
     """
-    Downloads a file directly from S3 using Boto3 to a temporary path.
+    Streams a file from S3 into memory (spilling to a private temp file when large).
     
     Args:
         filename (str): The S3 Key 
         
     Returns:
-        str: The local path to the downloaded temporary file.
+        SpooledDownload: pass `.source` to the parser and close() it when done.
     """
-    tmp_path = None
     BUCKET_NAME = "txitaxlawcases"
+    # 1. DECODE THE KEY
+    s3_key = unquote(filename)
+    print(f">>> [S3] Downloading Key: '{s3_key}'...")
     try:
-        # 1. DECODE THE KEY
-        s3_key = unquote(filename)
-
-        actual_filename = os.path.basename(s3_key)
-        
-        # Join with current working directory
-        local_path = os.path.join(os.getcwd(), actual_filename)
-
-        print(f">>> [S3] Downloading Key: '{s3_key}'...")
-        print(f">>> [S3] Target Path: '{local_path}'")
-        
-        s3_client.download_file(BUCKET_NAME, s3_key, local_path)
-        
-        print(f">>> [S3] Download successful. Saved to: {local_path}")
-        return local_path
-
+        return download_to_spool(get_s3_client(), BUCKET_NAME, s3_key, max_memory=DOWNLOAD_SPOOL_MAX_MB * 1024 * 1024)
     except ClientError as e:
         print(f"!!! AWS ClientError: {e}")
-        # Clean up empty file if download failed
-        if tmp_path and os.path.exists(tmp_path):
-            os.remove(tmp_path) 
         raise e
-        
     except Exception as e:
         print(f"!!! Unexpected Error: {e}")
-        if tmp_path and os.path.exists(tmp_path):
-            os.remove(tmp_path)
         raise e
     
 
@@ -128,70 +108,19 @@ def run_ingestion_task(thread_id: str, file_url: str):
     
     # 1. Download
     try:
-        temp_path = download_file_from_s3(file_url)
+        download = download_file_from_s3(file_url)
         original_name = file_url.split("/")[-1].split("?")[0]
     except Exception as e:
         print(f"!!! Download Failed: {e}")
         return
 
     try:
-        # 2. Vectorize (Add to Brain)
-        loader = PyPDFLoader(temp_path)
-        docs = loader.load()
-        
-        # Tag vectors with S3 URL so citations work later
-        for d in docs:
-            d.metadata["source"] = file_url
-            d.metadata["filename"] = original_name
-            d.metadata["thread_id"] = thread_id # Critical for isolation
-        
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100)
-        chunks = text_splitter.split_documents(docs)
-        
-        if chunks:
-            texts = [c.page_content for c in chunks]
-            metadatas = [c.metadata for c in chunks]
-            embeddings = embedding_manager.generate_embeddings(texts)
-            
-            vectors = []
-            for i, text in enumerate(texts):
-                vectors.append({
-                    "key": str(uuid.uuid4()),
-                    "data": {"float32": embeddings[i].tolist()},
-                    "metadata": {**metadatas[i], "text": text, "user": thread_id}
-                })
-            
-            vector_store.s3vectors.put_vectors(
-                vectorBucketName=vector_store.bucket_name,
-                indexName="file-upload-index",
-                vectors=vectors
-            )
-            print(f">>> [Ingest Task] Uploaded {len(vectors)} vectors.")
-        
-        # 3. Build Manifest (For Router)
-        loader_manifest = PyPDFLoader(temp_path)
-        docs_manifest = loader_manifest.load_and_split()
-        if docs_manifest:
-            preview = docs_manifest[0].page_content[:1000].replace("\n", " ")
-            new_manifest_entry = f"FILENAME: {original_name}\nPREVIEW: {preview}\n\n"
-            
-            # Update Redis
-            key = f"rag_session:{thread_id}"
-            current_manifest = redis_client.hget(key, "file_manifest") or ""
-            
-            # Simple dedup
-            if original_name not in current_manifest:
-                updated_manifest = (current_manifest + "\n\n" + new_manifest_entry).strip()
-                redis_client.hset(key, "file_manifest", updated_manifest)
-                print(f">>> [Ingest Task] Redis Manifest Updated.")
-            else:
-                print(f">>> [Ingest Task] Manifest already exists. Skipping.")
-
+        # 2. Stream pages -> chunks -> embed -> upload, then the manifest
+        get_ingest_pipeline().ingest(download.source, thread_id, source=file_url, filename=original_name)
     except Exception as e:
         print(f"!!! Ingestion Failed: {e}")
     finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+        download.close()
 
 @app.post("/ingest")
 async def ingest_files_endpoint(request: IngestRequest):
@@ -233,7 +162,7 @@ async def query_pipeline(request: QueryRequest):
     
 # 1. FETCH STATE (Populated by /ingest)
     key = f"rag_session:{request.thread_id}"
-    state_data = redis_client.hgetall(key)
+    state_data = get_redis().hgetall(key)
     
     conversation_summary = state_data.get("conversation_summary", "")
     file_manifest = state_data.get("file_manifest", "")
@@ -250,10 +179,11 @@ async def query_pipeline(request: QueryRequest):
     
     # 4. RUN PIPELINE
     try:
-        final_state = rag_app.invoke(inputs)
+        # Off the event loop, so concurrent turns overlap (and their query embeddings batch together)
+        final_state = await asyncio.to_thread(get_rag_app().invoke, inputs)
         
         # 4. UPDATE HISTORY
-        redis_client.hset(key, "conversation_summary", final_state["updated_summary"])
+        get_redis().hset(key, "conversation_summary", final_state["updated_summary"])
         
         source_paths = []
         if final_state.get("source_metadata"):
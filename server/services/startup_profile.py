@@ -0,0 +1,93 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Parses `python -X importtime` output into {"module", "depth", "self_ms", "cumulative_ms"} rows."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            rows.append({
+                "module": name.strip(),
+                # Nested imports are indented by two spaces per level
+                "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000
+            })
+        except ValueError:
+            continue
+    return rows
+
+
+def import_profile(module: str = "main", top: int = 25) -> Dict[str, Any]:
+    """Imports `module` in a fresh interpreter with -X importtime and reports where the time goes."""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SERVER_DIR, capture_output=True, text=True
+    )
+    wall_ms = 1000 * (time.perf_counter() - start)
+    rows = parse_importtime(proc.stderr)
+
+    # Top-level packages (first dotted component), by their outermost cumulative time
+    packages: Dict[str, float] = {}
+    for row in rows:
+        if row["depth"] == 0:
+            package = row["module"].split(".")[0]
+            packages[package] = packages.get(package, 0.0) + row["cumulative_ms"]
+
+    print(f"[StartupProfile] import {module}: {wall_ms:.0f} ms wall (incl. interpreter start), {len(rows)} modules")
+    if proc.returncode != 0:
+        print(f"[StartupProfile] Import failed; partial profile below. Last error line: {proc.stderr.strip().splitlines()[-1]}")
+
+    print(f"\n[StartupProfile] Top {top} packages by cumulative import time:")
+    for package, ms in sorted(packages.items(), key=lambda kv: -kv[1])[:top]:
+        print(f"  {ms:9.1f} ms  {package}")
+
+    print(f"\n[StartupProfile] Top {top} modules by self time:")
+    for row in sorted(rows, key=lambda r: -r["self_ms"])[:top]:
+        print(f"  {row['self_ms']:9.1f} ms  {row['module']}")
+
+    return {"wall_ms": wall_ms, "ok": proc.returncode == 0, "packages": packages, "modules": rows}
+
+
+def warm_profile() -> Dict[str, float]:
+    """Builds every shared instance through the registry and reports what each cost."""
+    sys.path.insert(0, SERVER_DIR)
+    from services import registry
+
+    getters = [
+        registry.get_embedding_manager, registry.get_query_embedder, registry.get_vector_store,
+        registry.get_rag_retriever, registry.get_rag_app, registry.get_redis, registry.get_reranker
+    ]
+    print("\n[StartupProfile] Warm-up cost per shared instance:")
+    for getter in getters:
+        try:
+            getter()
+        except Exception as e:
+            print(f"  {getter.__name__} failed: {e}")
+    for name, seconds in sorted(registry.init_times.items(), key=lambda kv: -kv[1]):
+        print(f"  {1000 * seconds:9.1f} ms  {name}")
+    return dict(registry.init_times)
+
+
+if __name__ == "__main__":
+    # python -m services.startup_profile --top 20 --warm
+    parser = argparse.ArgumentParser(description="Where does API worker startup time go?")
+    parser.add_argument("--module", default="main", help="Module to import (the ASGI app module)")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--warm", action="store_true", help="Also time the registry warm-up (loads models, connects clients)")
+    args = parser.parse_args()
+
+    import_profile(args.module, top=args.top)
+    if args.warm:
+        warm_profile()
@@ -0,0 +1,393 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import numpy as np
+from services.lexical_index import BM25Index, chunk_document_text
+from services.vector_codec import VectorCodec
+
+DEFAULT_THREAD_INDEX_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "thread_index")
+MERGE_ROWS = 8192  # rows copied per step when a file's staged rows are merged into the spill
+
+class ThreadIndex:
+    """
+    Dense index of one thread's uploaded chunks: a unit-normalized matrix + metadata rows.
+    vectors holds float32, float16 or int8 codes (int8 with per-row scales).
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        records: List[Dict[str, Any]],
+        partial: bool = False,
+        mtime: int = 0,
+        scales: Optional[np.ndarray] = None,
+        files: Optional[List[str]] = None
+    ):
+        self.vectors = vectors
+        self.scales = scales
+        self.codec = VectorCodec(str(vectors.dtype))
+        self.records = records
+        # True when the thread had files ingested before this index existed; such
+        # an index can't answer on its own, so searches fall back to S3 Vectors
+        self.partial = partial
+        # Filenames mirrored into this index (None: spilled before this was tracked)
+        self.files = files
+        self.mtime = mtime
+        self._bm25: Optional[BM25Index] = None
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + (0 if self.scales is None else self.scales.nbytes)
+
+    def decoded(self) -> np.ndarray:
+        return self.codec.decode(self.vectors, self.scales)
+
+    def vector(self, i: int) -> np.ndarray:
+        return self.codec.decode(self.vectors[i], None if self.scales is None else self.scales[i])
+
+    def search(self, query_vector: List[float], k: int = 5) -> List[Dict[str, Any]]:
+        if len(self.records) == 0:
+            return []
+        query = np.asarray(query_vector, dtype="float32")
+        query = query / (np.linalg.norm(query) or 1.0)
+        sims = self.codec.scores(self.vectors, self.scales, query)
+        best = np.argsort(-sims)[:k]
+        return [
+            {"key": self.records[i]["key"], "metadata": self.records[i]["metadata"], "distance": float(1.0 - sims[i]), "vector": self.vector(i)}
+            for i in best
+        ]
+
+    def lexical_search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        if self._bm25 is None:
+            # Built on first use; a thread's index is replaced (not mutated) on every add
+            self._bm25 = BM25Index([chunk_document_text(r["metadata"]) for r in self.records])
+        return [
+            {"key": self.records[i]["key"], "metadata": self.records[i]["metadata"], "bm25": score, "vector": self.vector(i)}
+            for i, score in self._bm25.search(query, k=k)
+        ]
+
+
+class ThreadIndexStore:
+    """
+    Per-thread private document indexes held in memory with LRU eviction.
+
+    Every write is persisted to spill_dir, so an evicted thread (or a thread
+    ingested by another worker process) is reloaded from disk on its next search
+    instead of falling back to a filtered remote query. dtype "float16" / "int8"
+    stores compact codes, fitting 2x / ~4x more threads into max_bytes.
+
+    Ingest workers are separate processes sharing spill_dir, so every
+    read-modify-write of a thread's spill holds an flock on the thread's lock
+    file. The spill also records which files it holds; with expected_files
+    (thread_id -> filenames in the thread's manifest), an index missing any of
+    them (e.g. ingested on another node) is treated as partial, so the search
+    falls back to S3 Vectors instead of silently missing a file.
+    """
+
+    def __init__(
+        self,
+        spill_dir: str = DEFAULT_THREAD_INDEX_DIR,
+        max_threads: int = 256,
+        max_bytes: int = 256 * 1024 * 1024,
+        dtype: str = "float32",
+        expected_files: Optional[Callable[[str], Iterable[str]]] = None
+    ):
+        self.spill_dir = spill_dir
+        self.expected_files = expected_files
+        self.codec = VectorCodec(dtype)
+        self.max_threads = max_threads
+        self.max_bytes = max_bytes
+        os.makedirs(self.spill_dir, exist_ok=True)
+
+        self._indexes: "OrderedDict[str, ThreadIndex]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _paths(self, thread_id: str):
+        name = hashlib.sha256(thread_id.encode()).hexdigest()
+        base = os.path.join(self.spill_dir, name)
+        return base + ".npy", base + ".jsonl", base + ".scales.npy"
+
+    @contextmanager
+    def _file_lock(self, thread_id: str, exclusive: bool = True):
+        """Cross-process lock on one thread's spill (shared for reads, exclusive for writes)."""
+        lock_path = self._paths(thread_id)[0][:-len(".npy")] + ".lock"
+        with open(lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _spill(self, thread_id: str, index: ThreadIndex):
+        vec_path, rec_path, scales_path = self._paths(thread_id)
+        # Write to temp files then rename, so readers never see a half-written index
+        with open(vec_path + ".tmp", "wb") as f:
+            np.save(f, index.vectors)
+        if index.scales is not None:
+            with open(scales_path + ".tmp", "wb") as f:
+                np.save(f, index.scales)
+        with open(rec_path + ".tmp", "w") as f:
+            f.write(json.dumps({"partial": index.partial, "files": index.files}) + "\n")
+            for rec in index.records:
+                f.write(json.dumps(rec) + "\n")
+        os.replace(rec_path + ".tmp", rec_path)
+        if index.scales is not None:
+            os.replace(scales_path + ".tmp", scales_path)
+        # The vectors file goes last: its mtime is the freshness marker
+        os.replace(vec_path + ".tmp", vec_path)
+        index.mtime = os.stat(vec_path).st_mtime_ns
+
+    def _load_from_disk(self, thread_id: str, locked: bool = False) -> Optional[ThreadIndex]:
+        vec_path, rec_path, scales_path = self._paths(thread_id)
+        if not os.path.exists(vec_path) or not os.path.exists(rec_path):
+            return None
+        try:
+            # Shared lock: the three files are renamed one by one by a writer
+            # (locked: the caller already holds the exclusive lock)
+            with nullcontext() if locked else self._file_lock(thread_id, exclusive=False):
+                mtime = os.stat(vec_path).st_mtime_ns
+                vectors = np.load(vec_path)
+                scales = np.load(scales_path) if vectors.dtype == np.int8 else None
+                with open(rec_path) as f:
+                    header = json.loads(f.readline())
+                    records = [json.loads(line) for line in f]
+            return ThreadIndex(vectors, records, partial=header.get("partial", False), mtime=mtime, scales=scales, files=header.get("files"))
+        except Exception as e:
+            print(f"[ThreadIndex] Failed to load spilled index for {thread_id}: {e}")
+            return None
+
+    def _disk_mtime(self, thread_id: str) -> int:
+        try:
+            # Nanoseconds: two workers' spills within the same second must still differ
+            return os.stat(self._paths(thread_id)[0]).st_mtime_ns
+        except OSError:
+            return 0
+
+    def _put(self, thread_id: str, index: ThreadIndex):
+        if thread_id in self._indexes:
+            self._bytes -= self._indexes.pop(thread_id).nbytes
+        self._indexes[thread_id] = index
+        self._bytes += index.nbytes
+        # Evicted threads are already on disk, so eviction is just a drop
+        while len(self._indexes) > 1 and (len(self._indexes) > self.max_threads or self._bytes > self.max_bytes):
+            evicted_id, evicted = self._indexes.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            print(f"[ThreadIndex] Evicted thread {evicted_id} from memory.")
+
+    def _get(self, thread_id: str) -> Optional[ThreadIndex]:
+        index = self._indexes.get(thread_id)
+        # Another worker may have ingested more files into this thread since we loaded it
+        if index is not None and self._disk_mtime(thread_id) == index.mtime:
+            self._indexes.move_to_end(thread_id)
+            return index
+
+        index = self._load_from_disk(thread_id)
+        if index is not None:
+            self._put(thread_id, index)
+        return index
+
+    def begin(self, thread_id: str, filename: Optional[str] = None, fresh_thread: bool = True) -> "ThreadIndexWriter":
+        """Starts mirroring one file: append() per batch, then one commit() (or abort())."""
+        return ThreadIndexWriter(self, thread_id, filename, fresh_thread)
+
+    def add(self, thread_id: str, vectors: np.ndarray, records: List[Dict[str, Any]], fresh_thread: bool = True, filename: Optional[str] = None):
+        """
+        Appends a file's chunk vectors to the thread's index; rows with the same key
+        (a retried ingestion) are replaced rather than duplicated.
+        fresh_thread=False means the thread may already hold remote-only files.
+        """
+        writer = self.begin(thread_id, filename, fresh_thread)
+        try:
+            writer.append(vectors, records)
+            writer.commit()
+        except Exception:
+            writer.abort()
+            raise
+
+    def _merge(self, writer: "ThreadIndexWriter"):
+        """
+        Streams the spill plus the writer's staged shards into a new spill: old rows
+        are read through a memory map and copied MERGE_ROWS at a time, records line
+        by line, so memory stays flat however large the thread or the file is.
+        """
+        thread_id = writer.thread_id
+        vec_path, rec_path, scales_path = self._paths(thread_id)
+        with self._lock, self._file_lock(thread_id):
+            old_vectors, old_scales, old_codec, header, keep = None, None, None, None, []
+            if os.path.exists(vec_path) and os.path.exists(rec_path):
+                old_vectors = np.load(vec_path, mmap_mode="r")
+                old_codec = VectorCodec(str(old_vectors.dtype))
+                old_scales = np.load(scales_path) if old_vectors.dtype == np.int8 else None
+                with open(rec_path) as f:
+                    header = json.loads(f.readline())
+                    # Rows re-sent by this file (a retried ingestion) are replaced
+                    keep = [i for i, line in enumerate(f) if json.loads(line)["key"] not in writer.keys]
+
+            if header is None:
+                partial, files = not writer.fresh_thread, [writer.filename] if writer.filename else []
+            else:
+                partial, files = header.get("partial", False), header.get("files")
+                # An index spilled before files were tracked can't vouch for its contents
+                if files is not None and writer.filename:
+                    files = list(dict.fromkeys(files + [writer.filename]))
+
+            total = len(keep) + writer.rows
+            vectors_out = np.lib.format.open_memmap(vec_path + ".tmp", mode="w+", dtype=self.codec.dtype, shape=(total, writer.dim))
+            scales_out = np.empty(total, dtype="float32") if self.codec.dtype == "int8" else None
+            row = 0
+            for start in range(0, len(keep), MERGE_ROWS):
+                rows = keep[start:start + MERGE_ROWS]
+                codes = old_vectors[rows]
+                scales = None if old_scales is None else old_scales[rows]
+                if old_codec.dtype != self.codec.dtype:
+                    # Spilled under a different THREAD_INDEX_DTYPE: re-encode on the way through
+                    codes, scales = self.codec.encode(old_codec.decode(codes, scales))
+                vectors_out[row:row + len(rows)] = codes
+                if scales_out is not None:
+                    scales_out[row:row + len(rows)] = scales
+                row += len(rows)
+            for shard in range(writer.shards):
+                codes = np.load(writer.shard_path(shard))
+                vectors_out[row:row + len(codes)] = codes
+                if scales_out is not None:
+                    scales_out[row:row + len(codes)] = np.load(writer.shard_path(shard, scales=True))
+                row += len(codes)
+            vectors_out.flush()
+            del vectors_out, old_vectors
+
+            if scales_out is not None:
+                with open(scales_path + ".tmp", "wb") as f:
+                    np.save(f, scales_out)
+            with open(rec_path + ".tmp", "w") as out:
+                out.write(json.dumps({"partial": partial, "files": files}) + "\n")
+                if header is not None:
+                    wanted = set(keep)
+                    with open(rec_path) as f:
+                        f.readline()
+                        for i, line in enumerate(f):
+                            if i in wanted:
+                                out.write(line)
+                with open(writer.records_path) as f:
+                    shutil.copyfileobj(f, out)
+            os.replace(rec_path + ".tmp", rec_path)
+            if scales_out is not None:
+                os.replace(scales_path + ".tmp", scales_path)
+            # The vectors file goes last: its mtime is the freshness marker
+            os.replace(vec_path + ".tmp", vec_path)
+
+            # Not loaded back here: the next search (usually in another process) reads the new spill
+            if thread_id in self._indexes:
+                self._bytes -= self._indexes.pop(thread_id).nbytes
+            print(f"[ThreadIndex] Thread {thread_id} now holds {total} chunks.")
+
+    def remove(self, thread_id: str, keys: Iterable[str]):
+        """Drops rows by vector key (a document released from the thread)."""
+        keys = set(keys)
+        with self._lock, self._file_lock(thread_id):
+            existing = self._load_from_disk(thread_id, locked=True)
+            if existing is None:
+                return
+            keep = [i for i, r in enumerate(existing.records) if r["key"] not in keys]
+            if len(keep) == len(existing.records):
+                return
+            index = ThreadIndex(
+                existing.vectors[keep], [existing.records[i] for i in keep], partial=existing.partial,
+                scales=None if existing.scales is None else existing.scales[keep], files=existing.files
+            )
+            self._spill(thread_id, index)
+            self._put(thread_id, index)
+            print(f"[ThreadIndex] Removed {len(existing.records) - len(keep)} chunks from thread {thread_id}.")
+
+    def _complete(self, thread_id: str, index: Optional[ThreadIndex]) -> bool:
+        """True when the index holds every file the thread's manifest lists."""
+        if index is None or index.partial:
+            return False
+        if self.expected_files is None:
+            return True
+        try:
+            expected = set(self.expected_files(thread_id))
+        except Exception as e:
+            print(f"[ThreadIndex] Manifest check failed, using remote search: {e}")
+            return False
+        if index.files is None:
+            return not expected
+        missing = expected - set(index.files)
+        if missing:
+            print(f"[ThreadIndex] Thread {thread_id} index lacks {sorted(missing)}; using remote search.")
+        return not missing
+
+    def search(self, thread_id: str, query_vector: List[float], k: int = 5) -> Optional[List[Dict[str, Any]]]:
+        """Returns hits, or None when this thread has no complete local index."""
+        with self._lock:
+            index = self._get(thread_id)
+        if not self._complete(thread_id, index):
+            return None
+        return index.search(query_vector, k=k)
+
+    def lexical_search(self, thread_id: str, query: str, k: int = 5) -> Optional[List[Dict[str, Any]]]:
+        """BM25 over the thread's chunk text; None when the thread has no complete local index."""
+        with self._lock:
+            index = self._get(thread_id)
+        if not self._complete(thread_id, index):
+            return None
+        return index.lexical_search(query, k=k)
+
+
+class ThreadIndexWriter:
+    """
+    Mirrors one file into a thread's index batch by batch. Each append() writes
+    the batch's codes as an .npy shard and its records to a jsonl file in a
+    private staging directory, so nothing accumulates in memory; commit() merges
+    everything into the thread's spill once, under the thread's file lock.
+    """
+
+    def __init__(self, store: ThreadIndexStore, thread_id: str, filename: Optional[str], fresh_thread: bool):
+        self.store = store
+        self.thread_id = thread_id
+        self.filename = filename
+        self.fresh_thread = fresh_thread
+        self.keys = set()
+        self.rows = 0
+        self.shards = 0
+        self.dim = 0
+        self.stage_dir = tempfile.mkdtemp(prefix=".stage-", dir=store.spill_dir)
+        self.records_path = os.path.join(self.stage_dir, "records.jsonl")
+        open(self.records_path, "w").close()
+
+    def shard_path(self, shard: int, scales: bool = False) -> str:
+        return os.path.join(self.stage_dir, f"{shard:06d}{'.scales' if scales else ''}.npy")
+
+    def append(self, vectors: np.ndarray, records: List[Dict[str, Any]]):
+        if not records:
+            return
+        vectors = np.asarray(vectors, dtype="float32")
+        vectors = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+        codes, scales = self.store.codec.encode(vectors)
+        np.save(self.shard_path(self.shards), codes)
+        if scales is not None:
+            np.save(self.shard_path(self.shards, scales=True), scales)
+        with open(self.records_path, "a") as f:
+            for rec in records:
+                f.write(json.dumps(rec) + "\n")
+        self.keys.update(rec["key"] for rec in records)
+        self.dim = codes.shape[1]
+        self.rows += len(records)
+        self.shards += 1
+
+    def commit(self):
+        try:
+            if self.rows:
+                self.store._merge(self)
+        finally:
+            self.abort()
+
+    def abort(self):
+        shutil.rmtree(self.stage_dir, ignore_errors=True)
@@ -1,18 +1,39 @@
 import boto3
-from typing import List, Dict, Any
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 import traceback
+from services.result_cache import SemanticResultCache
+from services.thread_index import ThreadIndexStore
+
+GET_BATCH = 100  # GetVectors keys per request
 
 class VectorStore:
     """Manages document embeddings in vector store (AWS S3-based)."""
 
-    def __init__(self, collection_name: str = "pdf_doucments"):
+    def __init__(self, collection_name: str = "pdf_doucments", case_cache: Optional[SemanticResultCache] = None, thread_index: Optional[ThreadIndexStore] = None, vector_cache_size: int = 4096):
         self.region = "us-east-1"
         self.bucket_name = "vectorbuckettechxi"
         # We now manage two conceptual indexes (mapped to s3-vector-index and file-upload-index)
         self.s3vectors = boto3.client("s3vectors", region_name=self.region)
+        # s3-vector-index only changes on bulk loads, so its results are safe to cache
+        self.case_cache = case_cache
+        # Per-thread in-memory index of uploaded chunks; answers file_search with one matmul
+        self.thread_index = thread_index
+        # (index, key) -> stored embedding, so repeated hits (e.g. case cache hits) skip get_vectors.
+        # File keys are content-addressed; case entries are dropped when the case index version moves
+        self.vector_cache_size = vector_cache_size
+        self._vector_cache: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._vector_cache_version = None
+        self._vector_cache_lock = threading.Lock()
 
     # --- PATH A: PRIVATE FILES ---
     def search_private_files(self, query_vector: List[float], user_id: str, k: int = 5) -> List[Dict[str, Any]]:
+        if self.thread_index is not None:
+            local_hits = self.thread_index.search(user_id, query_vector, k=k)
+            if local_hits is not None:
+                print(f"   [VectorStore] PRIVATE FILES served from thread index.")
+                return local_hits
         try:
             print(f"   [VectorStore] Searching PRIVATE FILES...")
             response = self.s3vectors.query_vectors(
@@ -29,7 +50,14 @@ class VectorStore:
             return []
 
     # --- PATH B: PUBLIC CASES ---
-    def search_public_cases(self, query_vector: List[float], k: int = 5) -> List[Dict[str, Any]]:
+    def search_public_cases(self, query_vector: List[float], k: int = 5, sections: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        # `sections` is a prefilter hint for local backends; remote results are
+        # section-boosted in RAGRetriever instead
+        if self.case_cache is not None:
+            cached = self.case_cache.get(query_vector, k, sections=sections)
+            if cached is not None:
+                print(f"   [VectorStore] PUBLIC CASES served from cache.")
+                return cached
         try:
             print(f"   [VectorStore] Searching PUBLIC CASES...")
             response = self.s3vectors.query_vectors(
@@ -39,7 +67,77 @@ class VectorStore:
                 topK=k,
                 returnMetadata=True
             )
-            return response.get("vectors", [])
+            vectors = response.get("vectors", [])
+            if self.case_cache is not None:
+                self.case_cache.put(query_vector, k, vectors, sections=sections)
+            return vectors
         except Exception as e:
             print(f"[VectorStore] Case Search Error: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    # --- STORED VECTORS ---
+    def fetch_vectors(self, keys: List[str], index_name: str) -> Dict[str, List[float]]:
+        """Stored embeddings for hits that came back without them (query_vectors omits data)."""
+        vectors = {}
+        with self._vector_cache_lock:
+            version = self.case_cache.version if self.case_cache is not None else None
+            if version != self._vector_cache_version:
+                self._vector_cache.clear()
+                self._vector_cache_version = version
+            for key in keys:
+                vec = self._vector_cache.get((index_name, key))
+                if vec is not None:
+                    self._vector_cache.move_to_end((index_name, key))
+                    vectors[key] = vec
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        fetched = {}
+        try:
+            for start in range(0, len(missing), GET_BATCH):
+                response = self.s3vectors.get_vectors(
+                    vectorBucketName=self.bucket_name,
+                    indexName=index_name,
+                    keys=missing[start:start + GET_BATCH],
+                    returnData=True
+                )
+                for vec in response.get("vectors", []):
+                    fetched[vec["key"]] = vec["data"]["float32"]
+        except Exception as e:
+            print(f"[VectorStore] Get Vectors Error: {e}")
+        if fetched and self.vector_cache_size > 0:
+            with self._vector_cache_lock:
+                for key, vec in fetched.items():
+                    self._vector_cache[(index_name, key)] = vec
+                while len(self._vector_cache) > self.vector_cache_size:
+                    self._vector_cache.popitem(last=False)
+        vectors.update(fetched)
+        return vectors
+
+    def with_vectors(self, hits: List[Dict[str, Any]], index_name: str) -> List[Dict[str, Any]]:
+        """Hits carrying their stored "vector" (copies; cached result lists are never mutated)."""
+        missing = [hit["key"] for hit in hits if hit.get("vector") is None and hit.get("key")]
+        if not missing:
+            return hits
+        fetched = self.fetch_vectors(missing, index_name)
+        return [
+            {**hit, "vector": fetched[hit["key"]]} if hit.get("vector") is None and hit.get("key") in fetched else hit
+            for hit in hits
+        ]
+
+    # --- LEXICAL (BM25) PATHS ---
+    # S3 Vectors has no keyword search; these only answer from local indexes and
+    # return None when no lexical corpus is available (dense-only retrieval).
+    def lexical_search_private_files(self, query: str, user_id: str, k: int = 5) -> Optional[List[Dict[str, Any]]]:
+        if self.thread_index is None:
+            return None
+        return self.thread_index.lexical_search(user_id, query, k=k)
+
+    def lexical_search_public_cases(self, query: str, k: int = 5) -> Optional[List[Dict[str, Any]]]:
+        return None
+
+    def invalidate_case_cache(self, version: Optional[str] = None):
+        """
+        Drops this process's cached case results. Other workers follow the Redis
+        version key: after a bulk load run `python -m services.result_cache bump`.
+        """
+        if self.case_cache is not None:
+            self.case_cache.bump_version(version)
\ No newline at end of file
@@ -0,0 +1,431 @@
+import argparse
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional
+import numpy as np
+from services.vectorStore import VectorStore
+from services.thread_index import ThreadIndexStore
+from services.lexical_index import BM25Index, case_document_text
+from services.section_index import SectionIndex
+from services.vector_codec import VectorCodec, DTYPES
+
+CASE_INDEX_NAME = "s3-vector-index"
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "case_index")
+
+class CaseRecords:
+    """
+    records.jsonl behind an mmap: row -> {"key", "metadata"}, parsed on access.
+    record_offsets.npy (int64 (n + 1,) byte offsets of each line) is written by
+    build_index; older builds get it computed once from the newlines.
+    """
+
+    def __init__(self, path: str, offsets_path: str):
+        with open(path, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if os.path.exists(offsets_path):
+            self.offsets = np.load(offsets_path, mmap_mode="r")
+        else:
+            newlines = np.flatnonzero(np.frombuffer(self._data, dtype="uint8") == ord("\n"))
+            offsets = np.concatenate([[0], newlines + 1]).astype("int64")
+            self.offsets = offsets if offsets[-1] == len(self._data) else np.append(offsets, len(self._data))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: int) -> Dict[str, Any]:
+        return json.loads(self._data[int(self.offsets[row]):int(self.offsets[row + 1])])
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+
+class LocalCaseIndex:
+    """
+    Memory-mapped IVF (inverted file) index over the public case vectors.
+
+    On-disk layout (one directory):
+      vectors.npy    (n, stored_dim) codes, rows grouped by IVF list: unit-normalized
+                     float32, or compact float16 / int8 (see VectorCodec)
+      scales.npy     float32 (n,) per-row int8 scales (int8 indexes only)
+      codec.npz      code dtype + optional PCA projection (absent = plain float32)
+      centroids.npy  float32 (nlist, stored_dim)
+      offsets.npy    int64 (nlist + 1,) row range of each list inside vectors.npy
+      records.jsonl  {"key", "metadata"} per row, same order as vectors.npy
+      record_offsets.npy  int64 (n + 1,) byte offset of each records.jsonl line
+      sections_*.npy section -> rows postings (SectionIndex)
+      bm25_*.npy     BM25 postings over case text (BM25Index)
+      manifest.json  {"dim", "stored_dim", "dtype", "count", "nlist", "built_at"}
+
+    Everything that grows with the corpus is memory-mapped read-only (records are
+    parsed per hit), so every worker process on a node shares a single copy
+    through the OS page cache. Indexes built before the section/BM25 files
+    existed still load; those two are then built in each process's memory.
+    """
+
+    def __init__(self, index_dir: str = DEFAULT_INDEX_DIR, nprobe: int = 8):
+        self.index_dir = index_dir
+        self.nprobe = nprobe
+        self._load()
+
+    def _load(self):
+        print(f"[LocalCaseIndex] Loading index from: {self.index_dir}")
+        with open(os.path.join(self.index_dir, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        self.vectors = np.load(os.path.join(self.index_dir, "vectors.npy"), mmap_mode="r")
+        scales_path = os.path.join(self.index_dir, "scales.npy")
+        self.scales = np.load(scales_path, mmap_mode="r") if os.path.exists(scales_path) else None
+        self.codec = VectorCodec.load(os.path.join(self.index_dir, "codec.npz"))
+        self.centroids = np.load(os.path.join(self.index_dir, "centroids.npy"))
+        self.offsets = np.load(os.path.join(self.index_dir, "offsets.npy"))
+        self.records = CaseRecords(os.path.join(self.index_dir, "records.jsonl"), os.path.join(self.index_dir, "record_offsets.npy"))
+        self.version = str(self.manifest.get("built_at"))
+        self._bm25: Optional[BM25Index] = BM25Index.load(self.index_dir) if BM25Index.exists(self.index_dir) else None
+        self._bm25_lock = threading.Lock()
+        if SectionIndex.exists(self.index_dir):
+            self.sections = SectionIndex.load(self.index_dir)
+        else:
+            print("[LocalCaseIndex] No stored section index (older build); building it in memory.")
+            self.sections = SectionIndex.from_metadata(r["metadata"] for r in self.records)
+        print(
+            f"[LocalCaseIndex] Loaded {len(self.records)} vectors ({self.vectors.shape[1]}d {self.codec.dtype}) "
+            f"in {len(self.centroids)} lists ({len(self.sections)} sections indexed)."
+        )
+
+    def __len__(self):
+        return len(self.records)
+
+    def _query(self, query_vector: List[float]) -> np.ndarray:
+        query = np.asarray(query_vector, dtype="float32")
+        return self.codec.project(query / (np.linalg.norm(query) or 1.0))
+
+    def _scores(self, rows, query: np.ndarray) -> np.ndarray:
+        return self.codec.scores(self.vectors[rows], None if self.scales is None else self.scales[rows], query)
+
+    def vector(self, row: int) -> np.ndarray:
+        """Row vector in the embedding model's space (approximate for compact indexes)."""
+        if self.codec.is_identity:
+            return self.vectors[row]
+        return self.codec.reconstruct(self.vectors[row], None if self.scales is None else self.scales[row])
+
+    def _format(self, rows: np.ndarray, sims: np.ndarray) -> List[Dict[str, Any]]:
+        # Same shape as an s3vectors query_vectors hit (cosine distance), plus the
+        # stored vector so re-ranking (MMR) doesn't have to re-embed the text
+        hits = []
+        for r, s in zip(rows, sims):
+            record = self.records[r]
+            hits.append({"key": record["key"], "metadata": record["metadata"], "distance": float(1.0 - s), "vector": self.vector(r)})
+        return hits
+
+    @staticmethod
+    def _top_k(sims: np.ndarray, k: int) -> np.ndarray:
+        if len(sims) <= k:
+            return np.argsort(-sims)
+        top = np.argpartition(-sims, k)[:k]
+        return top[np.argsort(-sims[top])]
+
+    def search(self, query_vector: List[float], k: int = 5, nprobe: Optional[int] = None) -> List[Dict[str, Any]]:
+        query = self._query(query_vector)
+
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        lists = self._top_k(self.centroids @ query, nprobe)
+
+        rows = np.concatenate([np.arange(self.offsets[l], self.offsets[l + 1]) for l in lists])
+        if len(rows) == 0:
+            return []
+        sims = self._scores(rows, query)
+        best = self._top_k(sims, k)
+        return self._format(rows[best], sims[best])
+
+    def search_rows(self, query_vector: List[float], rows: np.ndarray, k: int = 5) -> List[Dict[str, Any]]:
+        """Exact search restricted to a candidate row set (e.g. cases citing a section)."""
+        if len(rows) == 0:
+            return []
+        query = self._query(query_vector)
+        sims = self._scores(rows, query)
+        best = self._top_k(sims, k)
+        return self._format(rows[best], sims[best])
+
+    def lexical_search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """BM25 over case metadata, main_issue and decision_reasoning."""
+        with self._bm25_lock:
+            if self._bm25 is None:
+                print(f"[LocalCaseIndex] Building BM25 index over {len(self.records)} cases...")
+                self._bm25 = BM25Index([case_document_text(r["metadata"]) for r in self.records])
+        hits = []
+        for i, score in self._bm25.search(query, k=k):
+            record = self.records[i]
+            hits.append({"key": record["key"], "metadata": record["metadata"], "bm25": score, "vector": self.vector(i)})
+        return hits
+
+    def exact_search(self, query_vector: List[float], k: int = 5) -> List[Dict[str, Any]]:
+        """Brute-force search over every row; the ground truth for recall checks."""
+        query = self._query(query_vector)
+        sims = self._scores(slice(None), query)
+        best = self._top_k(sims, k)
+        return self._format(best, sims[best])
+
+
+class LocalVectorStore(VectorStore):
+    """
+    VectorStore that answers search_public_cases from a LocalCaseIndex.
+    Private file search still goes to S3 Vectors. The index is hot-reloaded when
+    `refresh` swaps in a new build (detected via manifest.json mtime).
+    """
+
+    def __init__(self, index_dir: str = DEFAULT_INDEX_DIR, nprobe: int = 8, reload_check_interval: float = 30.0, thread_index: Optional[ThreadIndexStore] = None):
+        # No result cache: a local search is already cheaper than a cache lookup + copy
+        super().__init__(thread_index=thread_index)
+        self.index_dir = index_dir
+        self.nprobe = nprobe
+        self.reload_check_interval = reload_check_interval
+        self._reload_lock = threading.Lock()
+        self._last_reload_check = time.monotonic()
+        self._manifest_mtime = self._read_manifest_mtime()
+        self.case_index = LocalCaseIndex(index_dir, nprobe=nprobe)
+
+    def _read_manifest_mtime(self) -> float:
+        try:
+            return os.path.getmtime(os.path.join(self.index_dir, "manifest.json"))
+        except OSError:
+            return 0.0
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._last_reload_check < self.reload_check_interval:
+            return
+        with self._reload_lock:
+            self._last_reload_check = now
+            mtime = self._read_manifest_mtime()
+            if mtime and mtime != self._manifest_mtime:
+                print("[LocalVectorStore] Case index changed on disk. Reloading...")
+                self.case_index = LocalCaseIndex(self.index_dir, nprobe=self.nprobe)
+                self._manifest_mtime = mtime
+                self.invalidate_case_cache(self.case_index.version)
+
+    def search_public_cases(self, query_vector: List[float], k: int = 5, sections: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        try:
+            self._maybe_reload()
+            case_index = self.case_index
+            if sections:
+                rows = case_index.sections.candidates(sections)
+                if len(rows):
+                    print(f"   [LocalVectorStore] Searching PUBLIC CASES within {len(rows)} cases citing {sections}...")
+                    hits = case_index.search_rows(query_vector, rows, k=k)
+                    if len(hits) >= k:
+                        return hits
+                    # Too few cases cite the section: top up from the full index
+                    seen = {h["key"] for h in hits}
+                    return hits + [h for h in case_index.search(query_vector, k=k) if h["key"] not in seen][:k - len(hits)]
+
+            print(f"   [LocalVectorStore] Searching PUBLIC CASES (local index)...")
+            return case_index.search(query_vector, k=k)
+        except Exception as e:
+            print(f"[LocalVectorStore] Case Search Error: {e}")
+            return []
+
+    def lexical_search_public_cases(self, query: str, k: int = 5) -> Optional[List[Dict[str, Any]]]:
+        try:
+            return self.case_index.lexical_search(query, k=k)
+        except Exception as e:
+            print(f"[LocalVectorStore] Case Lexical Search Error: {e}")
+            return None
+
+
+# --- BUILD / REFRESH TOOLING ---
+
+def export_case_vectors(vector_store: VectorStore, export_dir: str, index_name: str = CASE_INDEX_NAME) -> int:
+    """Pages every vector (data + metadata) out of S3 Vectors into export_dir."""
+    os.makedirs(export_dir, exist_ok=True)
+    rows = []
+    records_path = os.path.join(export_dir, "records.jsonl")
+    next_token = None
+
+    with open(records_path, "w") as f:
+        while True:
+            params = {
+                "vectorBucketName": vector_store.bucket_name,
+                "indexName": index_name,
+                "maxResults": 1000,
+                "returnData": True,
+                "returnMetadata": True
+            }
+            if next_token:
+                params["nextToken"] = next_token
+            response = vector_store.s3vectors.list_vectors(**params)
+
+            for vec in response.get("vectors", []):
+                rows.append(vec["data"]["float32"])
+                f.write(json.dumps({"key": vec["key"], "metadata": vec.get("metadata", {})}) + "\n")
+
+            print(f"[Export] {len(rows)} vectors exported...")
+            next_token = response.get("nextToken")
+            if not next_token:
+                break
+
+    np.save(os.path.join(export_dir, "vectors.npy"), np.asarray(rows, dtype="float32"))
+    return len(rows)
+
+
+def _kmeans(data: np.ndarray, nlist: int, iterations: int = 20, sample_size: int = 50000, seed: int = 0) -> np.ndarray:
+    """Spherical k-means (cosine) on a sample; returns unit-normalized centroids."""
+    rng = np.random.default_rng(seed)
+    sample = data[rng.choice(len(data), size=min(sample_size, len(data)), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = sample[assign == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+            else:
+                # Re-seed empty lists so no centroid is wasted
+                centroids[c] = sample[rng.integers(len(sample))]
+        centroids /= np.linalg.norm(centroids, axis=1, keepdims=True) + 1e-12
+    return centroids.astype("float32")
+
+
+def build_index(export_dir: str, index_dir: str, nlist: Optional[int] = None, dtype: str = "float32", dims: Optional[int] = None) -> str:
+    """
+    Builds an IVF index from an export. Returns index_dir.
+    dtype ("float16"/"int8") and dims (PCA projection) make the stored vectors compact.
+    """
+    vectors = np.load(os.path.join(export_dir, "vectors.npy")).astype("float32")
+    with open(os.path.join(export_dir, "records.jsonl")) as f:
+        records = [line for line in f]
+    if len(vectors) == 0:
+        raise ValueError("Export is empty; nothing to index.")
+
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+    codec = VectorCodec.fit(vectors, dtype=dtype, dims=dims)
+    source_dim = vectors.shape[1]
+    codes, scales = codec.encode(vectors)
+    # Lists are clustered in the space the codes are scored in
+    projected = codec.project(vectors)
+    print(f"[Build] Storing {codec.dim(source_dim)}d {dtype} codes ({codec.bytes_per_vector(source_dim)} bytes/vector).")
+
+    # sqrt(n) lists is the usual IVF starting point
+    nlist = max(1, min(len(vectors), nlist or int(np.sqrt(len(vectors)))))
+    print(f"[Build] Clustering {len(vectors)} vectors into {nlist} lists...")
+    centroids = _kmeans(projected, nlist)
+
+    assign = np.argmax(projected @ centroids.T, axis=1)
+    order = np.argsort(assign, kind="stable")
+    offsets = np.zeros(nlist + 1, dtype="int64")
+    offsets[1:] = np.cumsum(np.bincount(assign, minlength=nlist))
+
+    os.makedirs(index_dir, exist_ok=True)
+    np.save(os.path.join(index_dir, "vectors.npy"), codes[order])
+    if scales is not None:
+        np.save(os.path.join(index_dir, "scales.npy"), scales[order])
+    codec.save(os.path.join(index_dir, "codec.npz"))
+    np.save(os.path.join(index_dir, "centroids.npy"), centroids)
+    np.save(os.path.join(index_dir, "offsets.npy"), offsets)
+    record_offsets = np.zeros(len(order) + 1, dtype="int64")
+    metadatas = []
+    with open(os.path.join(index_dir, "records.jsonl"), "wb") as f:
+        for row, i in enumerate(order):
+            line = records[i] if records[i].endswith("\n") else records[i] + "\n"
+            data = line.encode("utf-8")
+            f.write(data)
+            record_offsets[row + 1] = record_offsets[row] + len(data)
+            metadatas.append(json.loads(line)["metadata"])
+    np.save(os.path.join(index_dir, "record_offsets.npy"), record_offsets)
+    # Section and BM25 postings are built here once, then memory-mapped by every worker
+    SectionIndex.from_metadata(metadatas).save(index_dir)
+    BM25Index([case_document_text(m) for m in metadatas]).save(index_dir)
+    # manifest.json is written last: its presence/mtime marks a complete build
+    with open(os.path.join(index_dir, "manifest.json"), "w") as f:
+        json.dump({
+            "dim": int(source_dim), "stored_dim": int(codec.dim(source_dim)), "dtype": dtype,
+            "count": int(len(vectors)), "nlist": int(nlist), "built_at": time.time()
+        }, f)
+
+    print(f"[Build] Index written to: {index_dir}")
+    return index_dir
+
+
+def refresh_index(index_dir: str = DEFAULT_INDEX_DIR, nlist: Optional[int] = None, dtype: str = "float32", dims: Optional[int] = None) -> str:
+    """Export + build into a staging directory, then swap it in place of index_dir."""
+    staging = index_dir.rstrip("/") + ".staging"
+    export_dir = staging + ".export"
+    for path in (staging, export_dir):
+        shutil.rmtree(path, ignore_errors=True)
+
+    export_case_vectors(VectorStore(), export_dir)
+    build_index(export_dir, staging, nlist=nlist, dtype=dtype, dims=dims)
+
+    previous = index_dir.rstrip("/") + ".previous"
+    shutil.rmtree(previous, ignore_errors=True)
+    if os.path.exists(index_dir):
+        os.rename(index_dir, previous)
+    os.rename(staging, index_dir)
+    shutil.rmtree(export_dir, ignore_errors=True)
+    # Running workers keep their mmap of the old files until they reload
+    print(f"[Refresh] Swapped new index into: {index_dir}")
+    return index_dir
+
+
+def recall_report(index_dir: str = DEFAULT_INDEX_DIR, n_queries: int = 200, k: int = 10, nprobes: List[int] = (1, 4, 8, 16, 32)) -> Dict[int, Dict[str, float]]:
+    """
+    Recall@k of the IVF search against exact search, using indexed vectors
+    (slightly perturbed) as queries. For compact indexes this isolates the IVF
+    loss; `python -m services.vector_codec` measures the code loss itself.
+    """
+    index = LocalCaseIndex(index_dir)
+    rng = np.random.default_rng(0)
+    picks = rng.choice(len(index), size=min(n_queries, len(index)), replace=False)
+    queries = np.stack([index.vector(p) for p in picks])
+    queries = queries + rng.normal(0, 0.02, size=queries.shape).astype("float32")
+
+    truth = [{hit["key"] for hit in index.exact_search(q, k=k)} for q in queries]
+    report = {}
+    for nprobe in nprobes:
+        start = time.perf_counter()
+        found = [{hit["key"] for hit in index.search(q, k=k, nprobe=nprobe)} for q in queries]
+        elapsed = time.perf_counter() - start
+        recall = float(np.mean([len(f & t) / max(1, len(t)) for f, t in zip(found, truth)]))
+        report[nprobe] = {"recall": recall, "ms_per_query": 1000 * elapsed / len(queries)}
+        print(f"[Recall] nprobe={nprobe:<3} recall@{k}={recall:.3f}  {report[nprobe]['ms_per_query']:.3f} ms/query")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local case index tooling")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="Export s3-vector-index to a local directory")
+    p_export.add_argument("export_dir")
+
+    p_build = sub.add_parser("build", help="Build an IVF index from an export")
+    p_build.add_argument("export_dir")
+    p_build.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+    p_build.add_argument("--nlist", type=int, default=None)
+    p_build.add_argument("--dtype", default="float32", choices=DTYPES, help="Stored vector precision")
+    p_build.add_argument("--dims", type=int, default=None, help="PCA-reduce stored vectors to this many dimensions")
+
+    p_refresh = sub.add_parser("refresh", help="Export + build + swap in one step")
+    p_refresh.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+    p_refresh.add_argument("--nlist", type=int, default=None)
+    p_refresh.add_argument("--dtype", default="float32", choices=DTYPES)
+    p_refresh.add_argument("--dims", type=int, default=None)
+
+    p_recall = sub.add_parser("recall", help="Compare IVF recall against exact search")
+    p_recall.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+    p_recall.add_argument("--queries", type=int, default=200)
+    p_recall.add_argument("--k", type=int, default=10)
+
+    args = parser.parse_args()
+    if args.command == "export":
+        export_case_vectors(VectorStore(), args.export_dir)
+    elif args.command == "build":
+        build_index(args.export_dir, args.index_dir, nlist=args.nlist, dtype=args.dtype, dims=args.dims)
+    elif args.command == "refresh":
+        refresh_index(args.index_dir, nlist=args.nlist, dtype=args.dtype, dims=args.dims)
+    elif args.command == "recall":
+        recall_report(args.index_dir, n_queries=args.queries, k=args.k)
@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+DTYPES = ("float32", "float16", "int8")
+
+class VectorCodec:
+    """
+    Compact storage for unit-normalized embeddings: an optional learned projection
+    to fewer dimensions, then float32 / float16 / int8 codes.
+
+    The projection is an uncentered PCA (truncated SVD) fitted on the corpus, so
+    dot products in the reduced space approximate the original cosine scores.
+    int8 codes carry one float32 scale per vector (symmetric, max-abs / 127).
+    Queries are projected (never quantized) and scored against the codes.
+    """
+
+    def __init__(self, dtype: str = "float32", components: Optional[np.ndarray] = None):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown vector dtype '{dtype}'. Expected one of {DTYPES}.")
+        self.dtype = dtype
+        # (dim, source_dim) projection rows, or None to keep the full dimension
+        self.components = None if components is None else np.asarray(components, dtype="float32")
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, dtype: str = "float32", dims: Optional[int] = None, sample_size: int = 50000, seed: int = 0) -> "VectorCodec":
+        vectors = np.asarray(vectors, dtype="float32")
+        if not dims or dims >= vectors.shape[1]:
+            return cls(dtype)
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(len(vectors), size=min(sample_size, len(vectors)), replace=False)]
+        _, _, vt = np.linalg.svd(sample, full_matrices=False)
+        return cls(dtype, vt[:dims])
+
+    @property
+    def is_identity(self) -> bool:
+        return self.dtype == "float32" and self.components is None
+
+    def dim(self, source_dim: int) -> int:
+        return source_dim if self.components is None else self.components.shape[0]
+
+    def bytes_per_vector(self, source_dim: int) -> int:
+        dim = self.dim(source_dim)
+        return dim * np.dtype(self.dtype).itemsize + (4 if self.dtype == "int8" else 0)
+
+    def project(self, vectors: np.ndarray) -> np.ndarray:
+        """Full-dimension float vectors -> the (reduced) float space the codes live in."""
+        vectors = np.asarray(vectors, dtype="float32")
+        return vectors if self.components is None else vectors @ self.components.T
+
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Returns (codes, scales); scales is None unless dtype is int8."""
+        projected = self.project(vectors)
+        if self.dtype == "int8":
+            scales = (np.abs(projected).max(axis=-1) / 127.0).astype("float32")
+            scales[scales == 0] = 1.0
+            codes = np.clip(np.rint(projected / scales[..., None]), -127, 127).astype("int8")
+            return codes, scales
+        return projected.astype(self.dtype), None
+
+    def decode(self, codes: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+        """Codes -> float vectors in the (reduced) code space."""
+        decoded = np.asarray(codes, dtype="float32")
+        if scales is not None:
+            decoded = decoded * np.asarray(scales, dtype="float32")[..., None]
+        return decoded
+
+    def reconstruct(self, codes: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+        """Codes -> approximate full-dimension vectors (for MMR against raw query embeddings)."""
+        decoded = self.decode(codes, scales)
+        return decoded if self.components is None else decoded @ self.components
+
+    def scores(self, codes: np.ndarray, scales: Optional[np.ndarray], query: np.ndarray) -> np.ndarray:
+        """Dot products of stored codes with an already-projected query."""
+        sims = np.asarray(codes, dtype="float32") @ query
+        return sims * scales if scales is not None else sims
+
+    def save(self, path: str):
+        arrays = {"dtype": np.array(self.dtype)}
+        if self.components is not None:
+            arrays["components"] = self.components
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "VectorCodec":
+        if not os.path.exists(path):
+            return cls()
+        with np.load(path) as data:
+            return cls(str(data["dtype"]), data["components"] if "components" in data.files else None)
+
+
+# --- RECALL vs SIZE BENCHMARK ---
+
+def compression_report(
+    vectors: np.ndarray,
+    dims: List[Optional[int]] = (None, 256, 192, 128, 64),
+    dtypes: List[str] = DTYPES,
+    n_queries: int = 200,
+    k: int = 10,
+    noise: float = 0.02
+) -> List[Dict[str, float]]:
+    """
+    Recall@k of exhaustive search over compact codes against exact float32 search,
+    with the bytes each configuration needs per vector and for the whole corpus.
+    Queries are indexed vectors with a little noise, as in recall_report.
+    """
+    vectors = np.asarray(vectors, dtype="float32")
+    vectors = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+    rng = np.random.default_rng(0)
+    picks = rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)
+    queries = vectors[picks] + rng.normal(0, noise, size=(len(picks), vectors.shape[1])).astype("float32")
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    exact = queries @ vectors.T
+    truth = [set(np.argpartition(-row, k)[:k]) if len(row) > k else set(range(len(row))) for row in exact]
+
+    report = []
+    for d in dims:
+        for dtype in dtypes:
+            codec = VectorCodec.fit(vectors, dtype=dtype, dims=d)
+            codes, scales = codec.encode(vectors)
+            start = time.perf_counter()
+            sims = np.stack([codec.scores(codes, scales, q) for q in codec.project(queries)])
+            elapsed = time.perf_counter() - start
+            found = [set(np.argpartition(-row, k)[:k]) if len(row) > k else set(range(len(row))) for row in sims]
+            recall = float(np.mean([len(f & t) / max(1, len(t)) for f, t in zip(found, truth)]))
+            row = {
+                "dims": codec.dim(vectors.shape[1]),
+                "dtype": dtype,
+                "bytes_per_vector": codec.bytes_per_vector(vectors.shape[1]),
+                "total_mb": codec.bytes_per_vector(vectors.shape[1]) * len(vectors) / (1024 * 1024),
+                "recall": recall,
+                "ms_per_query": 1000 * elapsed / len(queries)
+            }
+            report.append(row)
+            print(
+                f"[Codec] dims={row['dims']:<4} {dtype:<8} {row['bytes_per_vector']:>5} B/vec  {row['total_mb']:8.1f} MB  "
+                f"recall@{k}={recall:.3f}  {row['ms_per_query']:.2f} ms/query"
+            )
+    return report
+
+
+if __name__ == "__main__":
+    # python -m services.vector_codec data/case_export --dims 0 192 128 --dtypes float16 int8
+    parser = argparse.ArgumentParser(description="Recall vs size for compact vector codes")
+    parser.add_argument("export_dir", help="Directory with vectors.npy (e.g. from `vectorStore_local export`)")
+    parser.add_argument("--dims", type=int, nargs="+", default=[0, 256, 192, 128, 64], help="0 = keep full dimension")
+    parser.add_argument("--dtypes", nargs="+", default=list(DTYPES), choices=DTYPES)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--output", default=None, help="Optional JSON file for the report")
+    args = parser.parse_args()
+
+    data = np.load(os.path.join(args.export_dir, "vectors.npy"), mmap_mode="r")
+    results = compression_report(data, dims=[d or None for d in args.dims], dtypes=args.dtypes, n_queries=args.queries, k=args.k)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,128 @@
+import json
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+from botocore.exceptions import ClientError
+
+THROTTLING_CODES = {"ThrottlingException", "TooManyRequestsException", "SlowDown", "ServiceUnavailableException", "RequestLimitExceeded"}
+TOO_LARGE_CODES = {"RequestEntityTooLarge", "RequestEntityTooLargeException", "PayloadTooLarge"}
+
+class VectorUploadError(Exception):
+    """Raised when some batches still failed after retries (the rest were uploaded)."""
+
+
+class VectorUploader:
+    """
+    Uploads vectors to an S3 Vectors index in size-aware batches on a bounded pool.
+
+    Batches are cut at max_vectors_per_request and at max_request_bytes of
+    estimated JSON payload (chunk text in metadata dominates). Throttled batches
+    are retried with exponential backoff + jitter; a batch rejected as too large
+    is split in half and resent, so one oversized request never sinks a document.
+    Per-batch latencies are kept in `batch_timings`.
+    """
+
+    def __init__(
+        self,
+        s3vectors,
+        bucket_name: str,
+        index_name: str = "file-upload-index",
+        max_vectors_per_request: int = 500,
+        max_request_bytes: int = 16 * 1024 * 1024,
+        max_workers: int = 4,
+        max_retries: int = 5,
+        base_backoff: float = 0.5
+    ):
+        self.s3vectors = s3vectors
+        self.bucket_name = bucket_name
+        self.index_name = index_name
+        self.max_vectors_per_request = max_vectors_per_request
+        self.max_request_bytes = max_request_bytes
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="vector-upload")
+        self._lock = threading.Lock()
+        self.batch_timings: deque = deque(maxlen=1024)
+        self.retries = 0
+
+    @staticmethod
+    def _payload_bytes(vector: Dict[str, Any]) -> int:
+        return len(json.dumps(vector, separators=(",", ":")).encode())
+
+    def split(self, vectors: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        batches, batch, batch_bytes = [], [], 0
+        for vector in vectors:
+            size = self._payload_bytes(vector)
+            if batch and (len(batch) >= self.max_vectors_per_request or batch_bytes + size > self.max_request_bytes):
+                batches.append(batch)
+                batch, batch_bytes = [], 0
+            batch.append(vector)
+            batch_bytes += size
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _put(self, batch: List[Dict[str, Any]]) -> int:
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                self.s3vectors.put_vectors(vectorBucketName=self.bucket_name, indexName=self.index_name, vectors=batch)
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.batch_timings.append((len(batch), elapsed))
+                print(f"[VectorUploader] {len(batch)} vectors in {1000 * elapsed:.0f} ms")
+                return len(batch)
+            except ClientError as e:
+                code = e.response.get("Error", {}).get("Code", "")
+                status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+                if (code in TOO_LARGE_CODES or status == 413) and len(batch) > 1:
+                    half = len(batch) // 2
+                    print(f"[VectorUploader] Batch of {len(batch)} too large; splitting.")
+                    return self._put(batch[:half]) + self._put(batch[half:])
+                if (code in THROTTLING_CODES or status in (429, 503)) and attempt < self.max_retries:
+                    delay = self.base_backoff * (2 ** attempt) * (0.5 + random.random())
+                    attempt += 1
+                    with self._lock:
+                        self.retries += 1
+                    print(f"[VectorUploader] Throttled ({code or status}); retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                    time.sleep(delay)
+                    continue
+                raise
+
+    def upload(self, vectors: List[Dict[str, Any]]) -> int:
+        """Uploads all vectors; returns the count. Raises VectorUploadError if any batch ultimately failed."""
+        if not vectors:
+            return 0
+        futures = [self._pool.submit(self._put, batch) for batch in self.split(vectors)]
+        uploaded, errors = 0, []
+        # Wait for every batch so the successful ones land even if another failed
+        for future in futures:
+            try:
+                uploaded += future.result()
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            raise VectorUploadError(f"{len(errors)}/{len(futures)} batches failed; first error: {errors[0]}")
+        return uploaded
+
+    def timing_stats(self) -> Dict[str, float]:
+        with self._lock:
+            timings = list(self.batch_timings)
+            retries = self.retries
+        if not timings:
+            return {"batches": 0, "retries": retries}
+        latencies = sorted(t for _, t in timings)
+        return {
+            "batches": len(timings),
+            "retries": retries,
+            "mean_vectors": sum(n for n, _ in timings) / len(timings),
+            "p50_ms": 1000 * latencies[len(latencies) // 2],
+            "p95_ms": 1000 * latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+        }
+
+    def close(self):
+        self._pool.shutdown(wait=True)
@@ -3,6 +3,7 @@ import { Paperclip, Send, X } from "lucide-react";
 import { Button } from "@/components/ui/button";
 import { Textarea } from "@/components/ui/textarea";
 import { FileChip } from "./FileChip";
+import { useWebSocket } from "./WebSocketProvider";
 import { cn } from "@/lib/utils";
 
 export function ChatInput({
@@ -16,8 +17,15 @@ export function ChatInput({
   const [isDragging, setIsDragging] = useState(false);
   const fileInputRef = useRef(null);
   const textareaRef = useRef(null);
+  const { ingestJobs } = useWebSocket();
 
-  const isAnyFileUploading = filesWithProgress.some((f) => f.isUploading);
+  // Server-side ingestion status: the latest "ingest" event, else what /upload-complete returned
+  const ingestStatusOf = (f) => (f.jobId && ingestJobs[f.jobId]?.status) || f.ingestStatus;
+  // A file is usable once its ingestion job is done; until then it stays pending
+  const isReady = (f) => !f.error && ingestStatusOf(f) === "done";
+  const isPending = (f) => f.isUploading || (!f.error && !["done", "failed"].includes(ingestStatusOf(f)));
+
+  const isAnyFileUploading = filesWithProgress.some(isPending);
 
   // Simulated S3 upload
   const uploadFileToS3 = async (fileWithProgress, index) => {
@@ -43,11 +51,32 @@ export function ChatInput({
         );
       });
 
-      // 3. Upload complete
+      // 3. Upload complete: queue server-side ingestion (status arrives as "ingest" socket events)
+      const queued = await fetch(`${protocol}://${location.host}/secure/chat/upload-complete`, {
+        method: "POST",
+        credentials: "include",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ file_path: data.file_path, conversation_id: conversationId }),
+      });
+      const job = await queued.json().catch(() => ({}));
+
+      if (!queued.ok) {
+        console.error("upload-complete failed", queued.status, job);
+        setFilesWithProgress((prev) =>
+          prev.map((f, i) =>
+            i === index
+              ? { ...f, progress: 100, isUploading: false, error: job.detail || `Upload failed (${queued.status})` }
+              : f,
+          ),
+        );
+        return;
+      }
+
+      // Pending until the ingestion job reports "done"
       setFilesWithProgress((prev) =>
         prev.map((f, i) =>
           i === index
-            ? { ...f, progress: 100, isUploading: false, uploaded: true }
+            ? { ...f, progress: 100, isUploading: false, jobId: job.job_id, ingestStatus: job.status }
             : f,
         ),
       );
@@ -85,14 +114,20 @@ export function ChatInput({
           file,
           progress: 0,
           isUploading: true,
-          uploaded: false,
         }));
 
         const startIndex = filesWithProgress.length;
         setFilesWithProgress((prev) => [...prev, ...newFiles]);
 
         newFiles.forEach((fileWithProgress, i) => {
-          uploadFileToS3(fileWithProgress, startIndex + i);
+          uploadFileToS3(fileWithProgress, startIndex + i).catch((e) => {
+            console.error("upload failed", e);
+            setFilesWithProgress((prev) =>
+              prev.map((f, j) =>
+                j === startIndex + i ? { ...f, isUploading: false, error: e.message } : f,
+              ),
+            );
+          });
         });
       }
     },
@@ -115,7 +150,7 @@ export function ChatInput({
 
   const handleSubmit = useCallback(() => {
     const uploadedFiles = filesWithProgress
-      .filter((f) => f.uploaded)
+      .filter(isReady)
       .map((f) => f.file);
     if (message.trim() || uploadedFiles.length > 0) {
       onSend(message, uploadedFiles);
@@ -126,7 +161,7 @@ export function ChatInput({
         fileInputRef.current.value = "";
       }
     }
-  }, [message, filesWithProgress, onSend]);
+  }, [message, filesWithProgress, ingestJobs, onSend]);
 
   const handleKeyDown = useCallback(
     (e) => {
@@ -174,7 +209,7 @@ export function ChatInput({
             <span className="text-sm font-medium text-muted-foreground">
               {filesWithProgress.length} file
               {filesWithProgress.length !== 1 ? "s" : ""} attached
-              {isAnyFileUploading && " (uploading...)"}
+              {isAnyFileUploading && " (processing...)"}
             </span>
 
             {!isAnyFileUploading && (
@@ -197,6 +232,9 @@ export function ChatInput({
                 onRemove={() => handleRemoveFile(index)}
                 uploadProgress={fileWithProgress.progress}
                 isUploading={fileWithProgress.isUploading}
+                ingestStatus={ingestStatusOf(fileWithProgress)}
+                ingestPages={fileWithProgress.jobId ? ingestJobs[fileWithProgress.jobId]?.pages : undefined}
+                error={fileWithProgress.error}
               />
             ))}
           </div>
@@ -244,7 +282,7 @@ export function ChatInput({
             disabled ||
             isAnyFileUploading ||
             (!message.trim() &&
-              filesWithProgress.filter((f) => f.uploaded).length === 0)
+              filesWithProgress.filter(isReady).length === 0)
           }
           size="icon"
           className="shrink-0 rounded-xl"
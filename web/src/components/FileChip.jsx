@@ -17,20 +17,32 @@ const formatFileSize = (bytes) => {
   return `${((bytes / 1024) / 1024).toFixed(1)} MB`;
 };
 
-export function FileChip({ file, onRemove, className, uploadProgress, isUploading, action }) {
+const ingestLabel = (status, pages) => {
+  if (status === "running") return pages ? `Processing (${pages} pages)` : "Processing";
+  if (status === "queued") return "Queued";
+  if (status === "retrying") return "Retrying";
+  if (status === "failed") return "Processing failed";
+  return null;
+};
+
+export function FileChip({ file, onRemove, className, uploadProgress, isUploading, action, ingestStatus, ingestPages, error }) {
   const { Icon, color, bgColor } = getFileIconAndColor(file);
   const isComplete = uploadProgress === 100;
+  // Uploaded but not yet searchable: the server is still ingesting it
+  const isProcessing = !error && ["queued", "running", "retrying"].includes(ingestStatus);
+  const isBusy = (isUploading && !isComplete) || isProcessing;
+  const statusText = error || ingestLabel(ingestStatus, ingestPages);
 
   return (
     <div
       className={cn(
         "flex items-center gap-3 p-2 rounded-2xl bg-secondary/80 border border-border hover:border-border transition-all group relative shadow-sm",
-        isUploading && !isComplete && "opacity-90",
+        isBusy && "opacity-90",
         className
       )}
     >
       <div className={cn("w-12 h-12 rounded-xl flex items-center justify-center shrink-0 relative overflow-hidden", bgColor)}>
-        {isUploading && !isComplete ? (
+        {isBusy ? (
           <>
             <Icon className={cn("w-6 h-6 opacity-30", color)} />
             <div className="absolute inset-0 flex items-center justify-center bg-background/5">
@@ -46,10 +58,10 @@ export function FileChip({ file, onRemove, className, uploadProgress, isUploadin
         <span className="text-sm font-medium truncate text-foreground">
           {file.name}
         </span>
-        <span className="text-xs text-muted-foreground">
+        <span className={cn("text-xs text-muted-foreground", (error || ingestStatus === "failed") && "text-destructive")}>
           {isUploading && !isComplete
             ? `Uploading ${uploadProgress ?? 0}%`
-            : formatFileSize(file.size).toUpperCase()}
+            : statusText || formatFileSize(file.size).toUpperCase()}
         </span>
       </div>
 
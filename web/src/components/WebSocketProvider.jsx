@@ -7,6 +7,8 @@ export const WebSocketProvider = ({ children }) => {
   const [isConnected, setIsConnected] = useState(false);
   const [messagesByChat, setMessagesByChat] = useState([]);
   const [isTyping, setIsTyping] = useState(false);
+  // Latest ingestion status per job_id, from the server's "ingest" events
+  const [ingestJobs, setIngestJobs] = useState({});
 
   useEffect(() => {
     const storedChats = localStorage.getItem("chatList");
@@ -98,10 +100,18 @@ export const WebSocketProvider = ({ children }) => {
 
 
     socketRef.current.onmessage = (event) => {
-      setIsTyping(false);
       let data = JSON.parse(event.data);
       if (typeof data === "string") data = JSON.parse(data);
 
+      // Ingestion status updates are not part of the answer stream: leave typing alone
+      if (data.type === "ingest") {
+        if (data.job_id) {
+          setIngestJobs(prev => ({ ...prev, [data.job_id]: { ...prev[data.job_id], ...data } }));
+        }
+        return;
+      }
+      setIsTyping(false);
+
       const chatId = data.thread_id;
       const title = data.title;
       if (!chatId) return;
@@ -163,7 +173,7 @@ export const WebSocketProvider = ({ children }) => {
   }
 
   return (
-    <WebSocketContext.Provider value={{ socket: socketRef.current, sendMessage, isTyping, isConnected, messagesByChat, createSocketConnection, hydrateChatMessages, insertChatMessage }}>
+    <WebSocketContext.Provider value={{ socket: socketRef.current, sendMessage, isTyping, isConnected, messagesByChat, createSocketConnection, hydrateChatMessages, insertChatMessage, ingestJobs }}>
       {children}
     </WebSocketContext.Provider>
   );